@@ -1,10 +1,40 @@
-from app.services.transcription_service import TranscriptionService
+from app.services.model_registry import WhisperModelRegistry
+from app.services.transcription_scheduler import TranscriptionScheduler
+from app.services.adaptive_model_policy import AdaptiveModelPolicy
 from app.config import settings
 
-# Global instance to avoid reloading the model (heavy operation)
-# This will be initialized on first import
-transcription_service = TranscriptionService(
-    model_size=settings.WHISPER_MODEL_SIZE,
-    device=settings.WHISPER_DEVICE
+# Whisper models are heavy, so they are shared process-wide and loaded on first use.
+# Several sizes / compute types can be resident; idle ones are evicted (LRU) over budget.
+model_registry = WhisperModelRegistry(
+    default_model_size=settings.WHISPER_MODEL_SIZE,
+    default_compute_type=settings.WHISPER_COMPUTE_TYPE,
+    memory_budget_mb=settings.WHISPER_MEMORY_BUDGET_MB,
+    allowed_model_sizes=settings.WHISPER_ALLOWED_MODELS,
+    allowed_compute_types=settings.WHISPER_ALLOWED_COMPUTE_TYPES,
+    device=settings.WHISPER_DEVICE,
+    engine=settings.WHISPER_ENGINE,
+    cpu_threads=settings.WHISPER_CPU_THREADS,
+    num_workers=settings.TRANSCRIPTION_WORKERS,
+    beam_size=settings.WHISPER_BEAM_SIZE,
+    batch_size=settings.WHISPER_BATCH_SIZE,
+    parallel_workers=settings.WHISPER_PARALLEL_WORKERS,
+    parallel_min_duration=settings.WHISPER_PARALLEL_MIN_DURATION,
+    window_seconds=settings.WHISPER_WINDOW_SECONDS,
+    window_overlap_seconds=settings.WHISPER_WINDOW_OVERLAP_SECONDS
 )
 
+# Graceful degradation under load: smaller models when the backlog grows
+adaptive_policy = AdaptiveModelPolicy(
+    available_models=settings.WHISPER_ALLOWED_MODELS,
+    short_clip_seconds=settings.WHISPER_ADAPTIVE_SHORT_CLIP_SECONDS,
+    queue_depth_per_step=settings.WHISPER_ADAPTIVE_QUEUE_STEP,
+    long_audio_seconds=settings.WHISPER_ADAPTIVE_LONG_AUDIO_SECONDS
+) if settings.WHISPER_ADAPTIVE_DOWNGRADE else None
+
+# All transcription call sites submit here instead of calling the model directly
+transcription_scheduler = TranscriptionScheduler(
+    model_registry,
+    workers=settings.TRANSCRIPTION_WORKERS,
+    max_queue=settings.TRANSCRIPTION_QUEUE_SIZE,
+    policy=adaptive_policy
+)
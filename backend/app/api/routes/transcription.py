@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pathlib import Path
+import asyncio
+import time
 from app.models.transcription_models import (
     TranscribeRequest,
     TranscribeResponse,
     SegmentResponse
 )
 # from app.services.transcription_service import TranscriptionService # Removed local import
-from app.api.deps import transcription_service
+from app.api.deps import transcription_scheduler
+from app.utils.audio_preprocess import probe_duration
+from app.utils.sse import format_sse
 
 router = APIRouter(prefix="/transcribe", tags=["Transcription"])
 
@@ -16,19 +23,23 @@ router = APIRouter(prefix="/transcribe", tags=["Transcription"])
 async def transcribe_audio(request: TranscribeRequest):
 
     try:
-        # Use singleton
-        result = transcription_service.transcribe(
-            audio_path=request.audio_path,
-            language=request.language
+        # Queue on the shared scheduler (shortest job first, 429 when full)
+        duration = await _requested_duration(request)
+        result = await transcription_scheduler.run(
+            lambda service: service.transcribe(
+                audio_path=request.audio_path,
+                language=request.language,
+                start_offset=request.start or 0.0,
+                end_offset=request.end
+            ),
+            duration=duration,
+            model_size=request.model_size,
+            compute_type=request.compute_type
         )
 
         segments = [
-            SegmentResponse(
-                start=s.start,
-                end=s.end,
-                text=s.text
-            )
-            for s in result.segments
+            SegmentResponse(start=start, end=end, text=text)
+            for start, end, text in result.segments
         ]
 
         return TranscribeResponse(
@@ -36,11 +47,124 @@ async def transcribe_audio(request: TranscribeRequest):
             text=result.text,
             segments=segments,
             language=result.language,
-            duration=result.duration
+            duration=result.duration,
+            model_size=result.model_size
         )
 
+    except HTTPException:
+        raise
+
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _requested_duration(request: TranscribeRequest) -> float:
+    """Seconds of audio the request will actually decode (only the time range, if one is given)."""
+    start = request.start or 0.0
+    if request.end is not None:
+        return request.end - start
+    return max(0.0, await run_in_threadpool(probe_duration, request.audio_path) - start)
+
+
+@router.post("/stream")
+async def transcribe_audio_stream(request: TranscribeRequest):
+    """
+    Same as POST /transcribe/ but streams Server-Sent Events while decoding:
+    - queued:   job accepted by the scheduler
+    - segment:  {start, end, text} as soon as Whisper yields it
+    - progress: {percent, elapsed_seconds, eta_seconds}
+    - done:     {language, duration, model_size}
+    - error:    {detail}
+    """
+    if not Path(request.audio_path).exists():
+        raise HTTPException(status_code=404, detail=f"Audio file not found: {request.audio_path}")
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    duration = await _requested_duration(request)
+    start_offset = request.start or 0.0
+    started = None
+    last_percent = -1
+
+    # Called from the scheduler worker thread -> hand events over to the event loop
+    def emit(event: str, data: dict):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def on_progress(percent: int):
+        nonlocal started, last_percent
+        if started is None:
+            started = time.time()
+        if percent <= last_percent:
+            return
+        last_percent = percent
+        elapsed = time.time() - started
+        eta = elapsed * (100 - percent) / percent if percent > 0 else None
+        emit("progress", {
+            "percent": percent,
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": round(eta, 1) if eta is not None else None
+        })
+
+    def on_segment(segment):
+        emit("segment", {"start": segment.start, "end": segment.end, "text": segment.text})
+        # Finer-grained progress than the 5% callback when the duration is known
+        if duration > 0:
+            on_progress(min(99, int(100 * (segment.end - start_offset) / duration)))
+
+    try:
+        transcription = transcription_scheduler.submit(
+            lambda service: service.transcribe(
+                audio_path=request.audio_path,
+                language=request.language,
+                progress_callback=on_progress,
+                segment_callback=on_segment,
+                start_offset=start_offset,
+                end_offset=request.end
+            ),
+            duration=duration,
+            model_size=request.model_size,
+            compute_type=request.compute_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Runs after every event the worker queued before finishing (same FIFO)
+    def on_done(future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            events.put_nowait(("error", {"detail": str(future.exception())}))
+        else:
+            result = future.result()
+            events.put_nowait(("done", {
+                "language": result.language,
+                "duration": result.duration,
+                "model_size": result.model_size
+            }))
+
+    transcription.add_done_callback(on_done)
+
+    async def event_stream():
+        try:
+            yield format_sse("queued", {"audio_duration_seconds": round(duration, 1)})
+            while True:
+                event, data = await events.get()
+                yield format_sse(event, data)
+                if event in ("done", "error"):
+                    return
+        finally:
+            # Client disconnected: drop the job if it has not started yet
+            if not transcription.done():
+                transcription.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
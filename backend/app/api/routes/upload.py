@@ -2,18 +2,33 @@
 Audio Upload Routes
 
 Handles audio file uploads and transcription jobs.
-Flow: Upload file -> get job_id -> poll status -> fetch result
+Flow: Upload file -> get job_id -> long-poll / stream status -> fetch result
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import asyncio
+import json
+import os
+import logging
+import time as _time
 from app.services.audio_uploader import audio_uploader_service
 # from app.services.transcription_service import TranscriptionService # Removed
-from app.api.deps import transcription_service
+from app.api.deps import transcription_scheduler, model_registry
+from app.services.transcription_scheduler import QueueFullError
 from app.services.transcript_cleaner import TranscriptCleaner
 from app.services.job_manager import job_manager
+from app.services.job_queue import job_queue
+from app.services.checkpoint_store import checkpoint_store, transcribe_resumable
+from app.services.transcript_cache import transcript_cache
 from app.services.rag_service import rag_service # Import RAG service
+from app.utils.audio_preprocess import preprocess_audio, load_audio, probe_duration
+from app.utils.sse import format_sse
+from app.config import settings
 
 
 router = APIRouter(
@@ -21,128 +36,494 @@ router = APIRouter(
     tags=["Audio Upload"]
 )
 
+logger = logging.getLogger(__name__)
+
 # Load once at startup — loading inside a route would be too slow
 # transcription_service = TranscriptionService() # Removed local init
 
 
-async def process_transcription(job_id: str):
-    """Runs in the background after upload. Transcribes and cleans the audio."""
+def transcribe_job(
+    job_id: str,
+    file_path: str,
+    service,
+    language: Optional[str] = None,
+    duration: Optional[float] = None
+):
+    """
+    Runs on a transcription scheduler worker. Preprocesses and transcribes the upload,
+    checkpointing as it goes and resuming from an earlier checkpoint if there is one.
+    """
+
+    job_manager.update_status(job_id, "processing", stage="preprocessing")
+
+    # Preprocess audio before transcription (convert to 16kHz mono, normalise loudness).
+    # "memory" mode pipes ffmpeg output straight into a NumPy buffer — no temp WAV.
+    # With windowed decoding the service streams (and normalises) the file itself.
+    if service.window_seconds > 0:
+        audio = file_path
+        preprocessed_path = None
+    elif settings.AUDIO_PREPROCESS_MODE == "memory":
+        audio = load_audio(file_path, duration)
+        preprocessed_path = None
+    else:
+        preprocessed_path = preprocess_audio(file_path, duration)
+        audio = preprocessed_path
+
+    progress_start_time = _time.time()
+    def report_progress(percent):
+        elapsed = _time.time() - progress_start_time
+        est_left = None
+        if percent == 0:
+            print(f"Transcription progress for job {job_id}: 0% done | Elapsed: 0.0s | Est. left: --", flush=True)
+        elif percent < 100:
+            est_total = elapsed / (percent / 100) if percent > 0 else 0
+            est_left = est_total - elapsed if percent > 0 else 0
+            print(f"Transcription progress for job {job_id}: {percent}% done | Elapsed: {elapsed:.1f}s | Est. left: {est_left:.1f}s", flush=True)
+        else:
+            est_left = 0.0
+            print(f"Transcription progress for job {job_id}: 100% done | Elapsed: {elapsed:.1f}s | Est. left: 0.0s", flush=True)
+
+        # Recorded in the job, which wakes clients waiting on /status
+        job_manager.update_progress(
+            job_id, percent, stage="transcribing",
+            eta_seconds=round(est_left, 1) if est_left is not None else None
+        )
+
+    try:
+        return transcribe_resumable(
+            service,
+            job_id,
+            audio_path=audio,
+            source_path=file_path,
+            language=language,
+            progress_callback=report_progress
+        )
+    finally:
+        # Clean up temp file (never the upload itself, which is reused when already 16kHz PCM)
+        if preprocessed_path and preprocessed_path != file_path and os.path.exists(preprocessed_path):
+            os.remove(preprocessed_path)
+
+
+async def process_transcription(
+    job_id: str,
+    transcription: asyncio.Future,
+    requested_model: str,
+    content_hash: Optional[str] = None,
+    language: Optional[str] = None
+):
+    """Runs in the background after upload. Waits for the scheduled transcription, then cleans and indexes it."""
 
     try:
         job = job_manager.get_job(job_id)
         if not job:
             return
 
-        job_manager.update_status(job_id, "processing")
-
-        # Preprocess audio before transcription (convert, denoise, trim silence)
-        from app.utils.audio_preprocess import preprocess_audio
-        import time as _time
-        import os
-        preprocessed_path = preprocess_audio(job["file_path"])
-
-        progress_start_time = _time.time()
-        def print_progress(percent):
-            elapsed = _time.time() - progress_start_time
-            if percent == 0:
-                print(f"Transcription progress for job {job_id}: 0% done | Elapsed: 0.0s | Est. left: --", flush=True)
-            elif percent < 100:
-                est_total = elapsed / (percent / 100) if percent > 0 else 0
-                est_left = est_total - elapsed if percent > 0 else 0
-                print(f"Transcription progress for job {job_id}: {percent}% done | Elapsed: {elapsed:.1f}s | Est. left: {est_left:.1f}s", flush=True)
-            else:
-                print(f"Transcription progress for job {job_id}: 100% done | Elapsed: {elapsed:.1f}s | Est. left: 0.0s", flush=True)
-
-        # Run blocking transcription in a separate thread to avoid blocking the event loop
-        try:
-            result = await run_in_threadpool(
-                lambda: transcription_service.transcribe(preprocessed_path, progress_callback=print_progress)
-            )
-        finally:
-            # Clean up temp file
-            if os.path.exists(preprocessed_path):
-                os.remove(preprocessed_path)
-        
+        result = await transcription
+        job_manager.update_progress(job_id, 0, stage="cleaning")
+
         # Clean the transcript (Async)
         # We disable LLM cleaning here to keep the "offline/local" promise by default, 
         # but you can enable it if you want Groq cleaning for uploads too.
         cleaned = await TranscriptCleaner.clean(result.text, use_llm=False)
 
-        segments_data = [
-            {"start": s.start, "end": s.end, "text": s.text}
-            for s in result.segments
-        ]
-
         # 4. RAG Indexing (Important Step for "Chat with Audio")
+        job_manager.update_progress(job_id, 0, stage="indexing")
         # For uploaded files, the JOB_ID becomes the "VIDEO_ID"
         try:
            # We now index SEGMENTS to support timestamps
-           rag_service.index_video(job_id, segments_data)
+           rag_service.index_video(job_id, result.segments)
         except Exception as e:
            print(f"RAG Indexing Error for upload {job_id}: {e}")
 
-        job_manager.complete_job(job_id, {
+        job_result = {
             "raw_text": result.text,
             "cleaned_text": cleaned["cleaned_text"],
             "cleaning_steps": cleaned["cleaning_steps"],
             "language": result.language,
             "duration": result.duration,
-            "segments": segments_data
-        })
+            # Model actually used; may be smaller than requested under load,
+            # so clients can re-run at full quality later
+            "model_size": result.model_size,
+            "requested_model_size": requested_model,
+            "downgraded": result.model_size != requested_model,
+            "segments": result.segments.to_list()
+        }
+        job_manager.complete_job(job_id, job_result)
+        checkpoint_store.delete(job_id)
+
+        # Duplicate uploads of the same bytes will complete instantly from now on
+        if content_hash:
+            transcript_cache.put(content_hash, result.model_size, result.compute_type, language, job_result)
 
     except Exception as e:
+        # The checkpoint is kept so POST /retry/{job_id} resumes where this run stopped
         job_manager.fail_job(job_id, str(e))
 
 
+def start_transcription(
+    job_id: str,
+    file_path: str,
+    duration: float,
+    model_size: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    language: Optional[str] = None
+) -> asyncio.Future:
+    """Queues an upload job on the scheduler. Raises QueueFullError (429) if there is no room."""
+    return transcription_scheduler.submit(
+        lambda service: transcribe_job(job_id, file_path, service, language, duration),
+        duration=duration,
+        model_size=model_size,
+        compute_type=compute_type
+    )
+
+
+def check_capacity():
+    """Raises QueueFullError (429) when there is no room for another upload job."""
+    if settings.JOB_EXECUTION_MODE == "queue":
+        if job_queue.depth() >= settings.JOB_QUEUE_MAX_DEPTH:
+            raise QueueFullError(retry_after=60)
+    else:
+        transcription_scheduler.check_capacity()
+
+
+def dispatch_upload_job(
+    background_tasks: BackgroundTasks,
+    job_id: str,
+    file_path: str,
+    duration: float,
+    requested_model: str,
+    model_size: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    language: Optional[str] = None,
+    content_hash: Optional[str] = None
+):
+    """
+    Inline mode: queues on this process's scheduler and finishes in a background task.
+    Queue mode: hands the job to a worker process (python -m app.worker) via the durable queue.
+    """
+    if settings.JOB_EXECUTION_MODE == "queue":
+        job_queue.enqueue(job_id, "upload", {
+            "file_path": file_path,
+            "duration": duration,
+            "requested_model": requested_model,
+            "model_size": model_size,
+            "compute_type": compute_type,
+            "language": language,
+            "content_hash": content_hash
+        }, priority=duration)  # shortest job first, like the scheduler
+        return
+
+    transcription = start_transcription(
+        job_id, file_path, duration,
+        model_size=model_size,
+        compute_type=compute_type,
+        language=language
+    )
+    background_tasks.add_task(
+        process_transcription, job_id, transcription, requested_model, content_hash, language
+    )
+
+
+async def run_queued_upload(job_id: str, payload: dict):
+    """Worker side of dispatch_upload_job: runs the whole upload pipeline in the worker process."""
+    transcription = start_transcription(
+        job_id,
+        payload["file_path"],
+        payload["duration"],
+        model_size=payload.get("model_size"),
+        compute_type=payload.get("compute_type"),
+        language=payload.get("language")
+    )
+    await process_transcription(
+        job_id, transcription, payload["requested_model"],
+        payload.get("content_hash"), payload.get("language")
+    )
+
+
+# Re-run video jobs started by recover_interrupted_jobs
+_recovered_tasks: set = set()
+
+
+async def recover_interrupted_jobs():
+    """
+    Called at startup and then periodically: re-queues upload and video jobs whose
+    process died (restart, crash, or a pod on another host that stopped heartbeating).
+    Jobs with a checkpoint resume from their last saved offset, the rest start over.
+    Each job is claimed by exactly one uvicorn worker.
+    """
+    for job in job_manager.claim_orphaned_jobs():
+        job_id, file_path = job["job_id"], job["file_path"]
+
+        if job["kind"] == "video":
+            # Video jobs (batch items) run again from their stored request; finished
+            # steps are cheap to repeat (metadata, captions and downloads are cached)
+            from app.models.video_models import VideoRequest
+            from app.services.video_pipeline import run_video_job
+
+            try:
+                payload = json.loads(job["payload"]) if job.get("payload") else {"video_url": file_path}
+                video_request = VideoRequest(**payload)
+            except Exception as e:
+                job_manager.fail_job(job_id, f"Recovery failed: {e}")
+                continue
+            job_manager.requeue_job(job_id)
+            logger.info(f"Recovered video job {job_id} ({video_request.video_url})")
+            task = asyncio.create_task(run_video_job(job_id, video_request))
+            _recovered_tasks.add(task)  # referenced until done, so it is not garbage-collected
+            task.add_done_callback(_recovered_tasks.discard)
+            continue
+
+        if job["kind"] != "upload":
+            # e.g. a video-run claim of a dead process; its waiters take the video over
+            job_manager.fail_job(job_id, "Interrupted by a restart")
+            continue
+
+        if not Path(file_path).exists():
+            job_manager.fail_job(job_id, "Interrupted by a restart; the uploaded file no longer exists")
+            checkpoint_store.delete(job_id)
+            continue
+
+        checkpoint = checkpoint_store.load(job_id) or {}
+        job_manager.requeue_job(job_id)
+        try:
+            # Pin the model so the resumed part matches the saved segments
+            transcription = start_transcription(
+                job_id,
+                file_path,
+                await run_in_threadpool(probe_duration, file_path),
+                model_size=checkpoint.get("model_size"),
+                language=checkpoint.get("language")
+            )
+        except Exception as e:
+            job_manager.fail_job(job_id, f"Recovery failed: {e}")
+            continue
+
+        logger.info(f"Recovered job {job_id} from {checkpoint.get('last_end', 0):.1f}s")
+        asyncio.create_task(
+            process_transcription(job_id, transcription, checkpoint.get("model_size") or model_registry.resolve()[0])
+        )
+
+    # Checkpoints of jobs that expired or no longer exist would never be used
+    for job_id in checkpoint_store.list_job_ids():
+        if not job_manager.get_job(job_id):
+            checkpoint_store.delete(job_id)
+
+
 @router.post("/upload")
 async def upload_and_start_transcription(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(..., description="Audio file to upload")
+    file: UploadFile = File(..., description="Audio file to upload"),
+    model_size: Optional[str] = Form(None, description="Whisper model size (e.g. tiny for a quick preview)"),
+    compute_type: Optional[str] = Form(None, description="Whisper compute type (e.g. int8, float32)"),
+    language: Optional[str] = Form(None, description="Spoken language code (e.g. en); auto-detected if empty")
 ):
     """
-    Saves the uploaded file, creates a job, and starts transcription in the background.
-    Returns a job_id immediately — no waiting.
+    Saves the uploaded file, creates a job, and queues transcription on the scheduler.
+    Returns a job_id immediately — no waiting. Returns 429 if the queue is full.
+    A file that was already transcribed with the same model and language completes instantly.
     """
 
+    try:
+        requested_model, requested_compute_type = model_registry.resolve(model_size, compute_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Reject before reading the body when there is no room in the queue
+    check_capacity()
+
     try:
         upload_result = await audio_uploader_service.save_file(file)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Content-addressed cache: identical bytes were already transcribed
+    cached = transcript_cache.get(
+        upload_result.content_hash, requested_model, requested_compute_type, language
+    )
+    if cached is not None:
+        Path(upload_result.file_path).unlink(missing_ok=True)  # duplicate bytes, not needed
+        # Describe this request, not the one that filled the cache (it may have asked for another model)
+        cached = {
+            **cached,
+            "requested_model_size": requested_model,
+            "downgraded": cached.get("model_size") != requested_model,
+        }
+        # The upload is gone, so record where the result came from instead of a dead path
+        job_id = job_manager.create_job(f"transcript-cache:{upload_result.content_hash}")
+        job_manager.complete_job(job_id, cached)
+        # Chat uses the job_id as the video id, so index the cached segments under it
+        background_tasks.add_task(rag_service.index_video, job_id, cached["segments"])
+        return {
+            "success": True,
+            "message": "Identical file was already transcribed. Result is ready.",
+            "job_id": job_id,
+            "cached": True,
+            "file_size_mb": upload_result.file_size_mb,
+            "audio_duration_seconds": cached.get("duration"),
+            "requested_model_size": requested_model,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    duration = await run_in_threadpool(probe_duration, upload_result.file_path)
     job_id = job_manager.create_job(upload_result.file_path)
-    background_tasks.add_task(process_transcription, job_id)
+
+    try:
+        dispatch_upload_job(
+            background_tasks,
+            job_id,
+            upload_result.file_path,
+            duration,
+            requested_model,
+            model_size=model_size,
+            compute_type=compute_type,
+            language=language,
+            content_hash=upload_result.content_hash
+        )
+    except QueueFullError:
+        # Queue filled up while the file was uploading
+        job_manager.fail_job(job_id, "Transcription queue is full")
+        Path(upload_result.file_path).unlink(missing_ok=True)
+        raise
 
     return {
         "success": True,
-        "message": "File uploaded successfully. Transcription started in background.",
+        "message": "File uploaded successfully. Transcription queued.",
         "job_id": job_id,
+        "cached": False,
         "file_size_mb": upload_result.file_size_mb,
+        "audio_duration_seconds": round(duration, 1),
+        "requested_model_size": requested_model,
         "timestamp": datetime.now().isoformat()
     }
 
 
-@router.get("/status/{job_id}")
-async def get_status(job_id: str):
-    """Returns the current status of a transcription job."""
+@router.post("/retry/{job_id}")
+async def retry_job(job_id: str, background_tasks: BackgroundTasks):
+    """Re-queues a failed job. It resumes from its last checkpoint instead of starting over."""
 
     job = job_manager.get_job(job_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    response = {
+    if job["status"] != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried (status: {job['status']})")
+
+    if not Path(job["file_path"]).exists():
+        raise HTTPException(status_code=410, detail="Uploaded file no longer exists")
+
+    checkpoint = checkpoint_store.load(job_id) or {}
+    duration = await run_in_threadpool(probe_duration, job["file_path"])
+    # Reset the job before dispatching: in queue mode a worker may lease it at once,
+    # and a late reset would overwrite the worker's "processing" state
+    job_manager.requeue_job(job_id)
+    try:
+        dispatch_upload_job(
+            background_tasks,
+            job_id,
+            job["file_path"],
+            duration,
+            checkpoint.get("model_size") or model_registry.resolve()[0],
+            model_size=checkpoint.get("model_size"),
+            language=checkpoint.get("language")
+        )
+    except Exception:
+        # Not dispatched (e.g. queue full -> 429): back to failed, so it can be retried later
+        job_manager.fail_job(job_id, job["error"] or "Retry could not be dispatched")
+        raise
+
+    return {
+        "success": True,
         "job_id": job_id,
+        "resume_from_seconds": checkpoint.get("last_end", 0.0),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _status_payload(job: dict) -> dict:
+    response = {
+        "job_id": job["job_id"],
         "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "eta_seconds": job["eta_seconds"],
+        "version": job["version"],  # pass back as ?since= to wait for the next change
         "created_at": job["created_at"],
         "completed_at": job["completed_at"],
     }
 
     if job.get("error"):
         response["error"] = job["error"]
-        
+
     return response
 
 
+@router.get("/status/{job_id}")
+async def get_status(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Long-poll: seconds to wait for the job to change"),
+    since: Optional[int] = Query(None, description="Version the client already has (defaults to the current one)")
+):
+    """
+    Returns the current status of a transcription job, with progress, stage and ETA.
+    With ?wait=N the request is held until the job's version moves past `since`
+    (or N seconds pass), so clients do not need to poll in a loop.
+    """
+
+    job = job_manager.get_job(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if wait > 0 and job["status"] not in ("completed", "failed"):
+        job = await job_manager.wait_for_change(
+            job_id,
+            job["version"] if since is None else since,
+            min(wait, settings.JOB_STATUS_MAX_WAIT_SECONDS)
+        )
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    return _status_payload(job)
+
+
+@router.get("/status/{job_id}/events")
+async def stream_status(job_id: str):
+    """
+    Server-Sent Events: a `status` event whenever the job changes (progress,
+    stage, ETA), then `done` once it completed or failed.
+    """
+
+    job = job_manager.get_job(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        current = job
+        yield format_sse("status", _status_payload(current))
+        while current["status"] not in ("completed", "failed"):
+            changed = await job_manager.wait_for_change(
+                job_id, current["version"], settings.JOB_STATUS_MAX_WAIT_SECONDS
+            )
+            if changed is None:
+                yield format_sse("error", {"detail": "Job not found"})
+                return
+            if changed["version"] == current["version"]:
+                yield ": keep-alive\n\n"  # comment line keeps proxies from closing the stream
+                continue
+            current = changed
+            yield format_sse("status", _status_payload(current))
+
+        yield format_sse("done", _status_payload(current))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/result/{job_id}")
 async def get_result(job_id: str):
     """Returns the transcript once the job is completed."""
@@ -158,9 +539,14 @@ async def get_result(job_id: str):
             "message": "Transcription not completed yet."
         }
 
+    # Transcripts live on disk and are only loaded when asked for
+    result = await run_in_threadpool(job_manager.get_result, job_id)
+    if result is None:
+        raise HTTPException(status_code=410, detail="Result is no longer available")
+
     return {
         "status": "completed",
-        "result": job["result"]
+        "result": result
     }
 
 
@@ -1,203 +1,176 @@
 from fastapi import APIRouter, HTTPException
-from urllib.parse import urlparse, parse_qs,unquote
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from datetime import datetime
+import asyncio
 import logging
-import time
+import uuid
 
-from app.models.video_models import VideoRequest
+from app.models.video_models import VideoRequest, BatchVideoRequest
+from app.services.video_pipeline import get_video_result, run_video_job, pipeline_stats
 from app.services.video_downloader import VideoDownloaderService
-from app.services.youtube_transcript_service import YouTubeTranscriptService
-from app.api.deps import transcription_service
-from app.services.transcript_cleaner import TranscriptCleaner
-from app.services.transcript_quality_checker import TranscriptQualityChecker
-from app.services.rag_service import rag_service  # When a video is successfully processed, we want to immediately save it to the RAG vector database.
+from app.services.download_cache import get_download_cache
+from app.services.job_manager import job_manager
+from app.services.job_queue import job_queue
+from app.services.transcription_scheduler import QueueFullError
+from app.config import settings
 
 router = APIRouter(prefix="/api/video", tags=["Video Operations"])
 logger = logging.getLogger(__name__)
 
-#  Robust & Safe YouTube Video ID Extractor
-def extract_video_id(url: str):
-    try:
-        parsed = urlparse(url)
-        netloc = parsed.netloc.lower()
-        path = parsed.path
-
-        #  1️ Handle attribution links ---
-        if "attribution_link" in path:
-            query = parse_qs(parsed.query)
-            if "u" in query:
-                decoded_url = unquote(query["u"][0])
-                return extract_video_id(decoded_url)
-
-        #  2️ Handle youtu.be short links ---
-        if "youtu.be" in netloc:
-            return path.strip("/").split("/")[0]
-
-        #  3️ Handle all youtube domains ---
-        if any(domain in netloc for domain in [
-            "youtube.com",
-            "m.youtube.com",
-            "music.youtube.com",
-            "gaming.youtube.com"
-        ]):
-
-            # Standard watch URL
-            query = parse_qs(parsed.query)
-            if "v" in query:
-                return query["v"][0]
-
-            # Path-based formats
-            parts = path.strip("/").split("/")
-
-            if parts[0] in ["live", "embed", "v", "shorts"]:
-                return parts[1] if len(parts) > 1 else None
-
-        return None
+# Inline batches run as tasks of this process; keep references so they are not garbage-collected
+_batch_tasks: set = set()
 
-    except Exception:
-        return None
 
 @router.post("/download")
 async def download_video(request: VideoRequest):
-
-    start_time = time.time()
-    validation_result = None  # To track why we failed/passed
-    
-    try:
-        # 1️ Extract video ID safely
-        video_id = extract_video_id(request.video_url)
-
-        if not video_id:
-            raise HTTPException(status_code=400, detail="Invalid or unsupported YouTube URL")
-
-        # 1.5 Fetch Video Title (CRITICAL for Validation)
-        video_title = VideoDownloaderService.get_video_title(request.video_url)
-        logger.info(f"Processing Video: {video_title} ({video_id})")
-
-        # 2️ Try manual YouTube transcript first (FAST PATH)
-        youtube_result = YouTubeTranscriptService.fetch_transcript(video_id)
-
-        if youtube_result.get("success"):
-            is_manual = youtube_result.get("source") == "youtube_manual"
-
-            # CASE A: Manual Transcript (Always Trust)
-            if is_manual:
-                logger.info("Manual transcript found. Skipping validation.")
-                cleaned = await TranscriptCleaner.clean(
-                    youtube_result["text"],
-                    use_llm=False  # Trust human caption
-                )
-
-                # Store for RAG immediately (Using segments for timestamps)
-                rag_service.index_video(video_id, youtube_result["segments"])
-
-                return {
-                    "success": True,
-                    "source": "youtube_manual",
-                    "video_id": video_id,
-                    "processing_time_seconds": round(time.time() - start_time, 2),
-                    "routing": "manual_trusted",
-                    "raw_text": youtube_result["text"],
-                    "cleaned_text": cleaned["cleaned_text"],
-                    "cleaning_steps": cleaned["cleaning_steps"],
-                    "segments": youtube_result["segments"]
-                }
-            
-            # CASE B: Auto-Generated (Must Validate)
-            logger.info("Auto-generated transcript found. Running Topic Validation...")
-            validation_result = TranscriptQualityChecker.validate_transcript(
-                youtube_result["text"], 
-                video_title
+    # Cached results return at once; concurrent requests for one video share a single run
+    if settings.JOB_EXECUTION_MODE != "queue":
+        return await get_video_result(request)
+    return await get_video_result(request, run=_run_in_worker)
+
+
+async def _run_in_worker(request: VideoRequest) -> dict:
+    """
+    Queue mode: a worker process runs the pipeline, this request just waits for it.
+    This process already holds the video's run claim (see get_video_result), so
+    the worker is told to run under it instead of claiming the video again.
+    """
+    if job_queue.depth() >= settings.JOB_QUEUE_MAX_DEPTH:
+        raise QueueFullError(retry_after=60)
+
+    job_id = job_manager.create_job(request.video_url, kind="video")
+    job_queue.enqueue(job_id, "video", {**request.model_dump(), "claimed": True})
+    logger.info(f"Queued video job {job_id} for {request.video_url}")
+
+    job = job_manager.get_job(job_id)
+    while job and job["status"] not in ("completed", "failed"):
+        job = await job_manager.wait_for_change(job_id, job["version"], settings.JOB_STATUS_MAX_WAIT_SECONDS)
+
+    if not job:
+        raise HTTPException(status_code=500, detail="Processing failed: job disappeared")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Processing failed: {job['error']}")
+
+    return await run_in_threadpool(job_manager.get_result, job_id)
+
+
+@router.post("/batch")
+async def start_batch(request: BatchVideoRequest):
+    """
+    Creates one job per video (a list of URLs, or a playlist / channel expanded
+    through yt-dlp) and runs them through the stage-limited pipeline.
+    Returns immediately; follow progress with GET /api/video/batch/{batch_id}
+    and fetch each transcript from /api/audio/result/{job_id}.
+    """
+
+    urls = request.video_urls
+    if request.playlist_url:
+        try:
+            urls = await run_in_threadpool(
+                VideoDownloaderService.expand_playlist, request.playlist_url, settings.BATCH_MAX_VIDEOS
             )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not expand playlist: {e}")
+        urls = list(dict.fromkeys(urls))
 
-            if validation_result["is_valid"]:
-                logger.info("Topic Validation Passed! Using auto-transcript.")
-                cleaned = await TranscriptCleaner.clean(
-                    youtube_result["text"],
-                    use_llm=False  # Speed optimization: Skip slow LLM cleaning
-                )
-
-                # Store for RAG immediately (Using segments for timestamps)
-                rag_service.index_video(video_id, youtube_result["segments"])
-                
-                return {
-                    "success": True,
-                    "source": "youtube_auto",
-                    "video_id": video_id,
-                    "processing_time_seconds": round(time.time() - start_time, 2),
-                    "routing": "auto_validated",
-                    "quality_check": validation_result,
-                    "raw_text": youtube_result["text"],
-                    "cleaned_text": cleaned["cleaned_text"],
-                    "cleaning_steps": cleaned["cleaning_steps"],
-                    "segments": youtube_result["segments"]
-                }
-            
-            logger.warning(f"Topic Validation Failed: {validation_result.get('reason')}. Switching to Whisper.")
-
-        # 3️ Fallback → Download & Whisper (SLOW PATH)
-        logger.info("Downloading audio for Whisper...")
-        downloader = VideoDownloaderService()
-
-        download_result = await downloader.download_audio(
-            url=request.video_url,
-            output_format=request.output_format,
-            quality=request.quality
-        )
+    if not urls:
+        raise HTTPException(status_code=400, detail="No videos found")
+    if len(urls) > settings.BATCH_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_VIDEOS} videos per batch")
 
-        
-        # 4️ Whisper Transcription
-        logger.info("Running Whisper (Local GPU/CPU)...")
-        # Use simple language hint from YouTube metadata if available (even if invalid content, lang tag might be ok)
-        lang_hint = None
-        if youtube_result.get("language"):
-             lang_hint = youtube_result["language"].split("-")[0]
-             
-
-        import time as _time
-        progress_start_time = _time.time()
-        def print_progress(percent):
-            elapsed = _time.time() - progress_start_time
-            if percent > 0:
-                est_total = elapsed / (percent / 100)
-                est_left = est_total - elapsed
-                print(f"Transcription progress: {percent}% done | Elapsed: {elapsed:.1f}s | Est. left: {est_left:.1f}s", flush=True)
-            else:
-                print(f"Transcription progress: {percent}% done", flush=True)
-
-        whisper_result = transcription_service.transcribe(
-            audio_path=download_result["file_path"],
-            language=lang_hint,
-            progress_callback=print_progress
-        )
-
-        # 5️ Clean the transcript
-        cleaned = await TranscriptCleaner.clean(
-            whisper_result.text,
-            use_llm=False  # Speed optimization: Skip slow LLM cleaning
+    try:
+        video_requests = [
+            VideoRequest(video_url=url, output_format=request.output_format, quality=request.quality)
+            for url in urls
+        ]
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    queue_mode = settings.JOB_EXECUTION_MODE == "queue"
+    if queue_mode and job_queue.depth() + len(video_requests) > settings.JOB_QUEUE_MAX_DEPTH:
+        raise QueueFullError(retry_after=60)
+
+    batch_id = uuid.uuid4().hex
+    # Hundreds of SQLite writes: keep them off the event loop
+    jobs = await run_in_threadpool(_create_batch_jobs, batch_id, video_requests, queue_mode)
+
+    if not queue_mode:
+        # All items start at once; the stage limits decide how many run each step
+        task = asyncio.create_task(asyncio.gather(
+            *(run_video_job(job_id, video_request) for job_id, video_request in jobs)
+        ))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+
+    logger.info(f"Started batch {batch_id} with {len(jobs)} videos")
+
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "jobs": [{"job_id": job_id, "video_url": r.video_url} for job_id, r in jobs],
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _create_batch_jobs(batch_id: str, video_requests: list, queue_mode: bool) -> list:
+    """Creates (and in queue mode enqueues) one job per video. Returns (job_id, request) pairs."""
+    jobs = []
+    for video_request in video_requests:
+        # The request is stored so an inline batch interrupted by a restart can be re-run
+        job_id = job_manager.create_job(
+            video_request.video_url, kind="video", batch_id=batch_id, payload=video_request.model_dump()
         )
-
-        # Prepare segments explicitly
-        segments_data = [{"start": s.start, "end": s.end, "text": s.text} for s in whisper_result.segments]
-
-        # Store for RAG immediately (with timestamps)
-        rag_service.index_video(video_id, segments_data)
-
-        return {
-            "success": True,
-            "source": "whisper",
-            "video_id": video_id,
-            "processing_time_seconds": round(time.time() - start_time, 2),
-            "routing": "fallback_whisper",
-            "validation_failure_reason": validation_result.get("reason") if validation_result else "no_youtube_caption",
-            "raw_text": whisper_result.text,
-            "cleaned_text": cleaned["cleaned_text"],
-            "cleaning_steps": cleaned["cleaning_steps"],
-            "segments": segments_data
-        }
-
-    except HTTPException:
-        raise
-
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
\ No newline at end of file
+        jobs.append((job_id, video_request))
+        if queue_mode:
+            job_queue.enqueue(job_id, "video", video_request.model_dump())
+    return jobs
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Aggregate progress of a batch, plus the status of every video in it."""
+
+    jobs = job_manager.list_batch_jobs(batch_id)
+
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    counts = {status: 0 for status in ("pending", "processing", "completed", "failed")}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+
+    total = len(jobs)
+    finished = counts["completed"] + counts["failed"]
+
+    # ETA from the batch's own throughput so far
+    started = datetime.fromisoformat(jobs[0]["created_at"])
+    elapsed = (datetime.now() - started).total_seconds()
+    eta = elapsed * (total - finished) / finished if finished else None
+
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "counts": counts,
+        "progress": round(100 * finished / total, 1),
+        "done": finished == total,
+        "elapsed_seconds": round(elapsed, 1),
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+        "pipeline": pipeline_stats(),  # stage occupancy in this process
+        "jobs": [
+            {
+                "job_id": job["job_id"],
+                "video_url": job["file_path"],
+                "status": job["status"],
+                "error": job["error"],
+            }
+            for job in jobs
+        ]
+    }
+
+
+@router.get("/downloads/cache")
+async def get_download_cache_stats():
+    """Size of the download cache against its quota, and its hit rate (counters are per process)."""
+    return await run_in_threadpool(lambda: get_download_cache().stats())
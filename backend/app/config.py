@@ -4,6 +4,7 @@ Loads settings from .env file
 """
 
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -11,22 +12,135 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+# Whisper hardware profile written by `python -m app.utils.whisper_benchmark`.
+# Environment variables still win over the profile.
+WHISPER_PROFILE_PATH = Path(os.getenv("WHISPER_PROFILE_PATH", Path(__file__).parent.parent / "whisper_profile.json"))
+
+
+def _load_whisper_profile() -> dict:
+    try:
+        with open(WHISPER_PROFILE_PATH, encoding="utf-8") as f:
+            return json.load(f).get("settings", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+_whisper_profile = _load_whisper_profile()
+
 
 class Settings:
     # Groq API (free LLM + Whisper API)
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
 
     # Whisper settings
-    WHISPER_MODEL_SIZE: str = os.getenv("WHISPER_MODEL_SIZE", "base")
+    WHISPER_MODEL_SIZE: str = os.getenv("WHISPER_MODEL_SIZE", "base")  # default when a request doesn't pick one
+    WHISPER_COMPUTE_TYPE: str = os.getenv("WHISPER_COMPUTE_TYPE", _whisper_profile.get("compute_type", "int8"))
+    # Models clients may request; each loads on first use
+    WHISPER_ALLOWED_MODELS: list = os.getenv(
+        "WHISPER_ALLOWED_MODELS", ",".join(dict.fromkeys(["tiny", "base", "small", WHISPER_MODEL_SIZE]))
+    ).split(",")
+    WHISPER_ALLOWED_COMPUTE_TYPES: list = os.getenv(
+        "WHISPER_ALLOWED_COMPUTE_TYPES", ",".join(dict.fromkeys(["int8", "float32", WHISPER_COMPUTE_TYPE]))
+    ).split(",")
+    WHISPER_MEMORY_BUDGET_MB: int = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "2048"))  # LRU eviction above this
     WHISPER_DEVICE: str = os.getenv("WHISPER_DEVICE", "cpu")
+    # "standard" = one decoder per file, "batched" = faster-whisper batched pipeline,
+    # "parallel" = split long audio across a process pool
+    WHISPER_ENGINE: str = os.getenv("WHISPER_ENGINE", "standard")
+    WHISPER_CPU_THREADS: int = int(os.getenv("WHISPER_CPU_THREADS", _whisper_profile.get("cpu_threads", 0)))  # 0 = faster-whisper default
+    WHISPER_BEAM_SIZE: int = int(os.getenv("WHISPER_BEAM_SIZE", _whisper_profile.get("beam_size", 5)))  # 1 = greedy
+    WHISPER_BATCH_SIZE: int = int(os.getenv("WHISPER_BATCH_SIZE", "8"))  # batched engine only
+    WHISPER_PARALLEL_WORKERS: int = int(os.getenv("WHISPER_PARALLEL_WORKERS", "0"))  # 0 = one per CPU core
+    WHISPER_PARALLEL_MIN_DURATION: float = float(os.getenv("WHISPER_PARALLEL_MIN_DURATION", "600"))  # seconds
+    # Bounded-memory decoding: transcribe files in fixed windows streamed from ffmpeg (0 = off)
+    WHISPER_WINDOW_SECONDS: float = float(os.getenv("WHISPER_WINDOW_SECONDS", "0"))
+    WHISPER_WINDOW_OVERLAP_SECONDS: float = float(os.getenv("WHISPER_WINDOW_OVERLAP_SECONDS", "30"))
+
+    # "memory" = decode uploads straight into a NumPy buffer, "file" = write a temp 16kHz WAV first
+    AUDIO_PREPROCESS_MODE: str = os.getenv("AUDIO_PREPROCESS_MODE", "memory")
+
+    # Transcription scheduler
+    TRANSCRIPTION_WORKERS: int = int(os.getenv("TRANSCRIPTION_WORKERS", _whisper_profile.get("num_workers", 2)))  # concurrent Whisper jobs
+    TRANSCRIPTION_QUEUE_SIZE: int = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "32"))  # waiting jobs before 429
+
+    # Adaptive downgrade: jobs without an explicit model use a smaller one when the queue is long
+    WHISPER_ADAPTIVE_DOWNGRADE: bool = os.getenv("WHISPER_ADAPTIVE_DOWNGRADE", "true").lower() == "true"
+    WHISPER_ADAPTIVE_SHORT_CLIP_SECONDS: float = float(os.getenv("WHISPER_ADAPTIVE_SHORT_CLIP_SECONDS", "120"))  # never downgraded
+    WHISPER_ADAPTIVE_QUEUE_STEP: int = int(os.getenv("WHISPER_ADAPTIVE_QUEUE_STEP", "4"))  # waiting jobs per step down
+    WHISPER_ADAPTIVE_LONG_AUDIO_SECONDS: float = float(os.getenv("WHISPER_ADAPTIVE_LONG_AUDIO_SECONDS", "1800"))  # one extra step
 
     # File paths
     DOWNLOAD_DIR: str = "app/downloads"
     UPLOAD_DIR: str = "app/uploads"
+    CHECKPOINT_DIR: str = "app/checkpoints"
+    TRANSCRIPT_CACHE_DIR: str = "app/cache/transcripts"
+    VIDEO_RESULT_CACHE_DIR: str = "app/cache/videos"
+    METADATA_CACHE_DIR: str = "app/cache/metadata"
+    JOB_DB_PATH: str = os.getenv("JOB_DB_PATH", "app/jobs/jobs.db")
+    JOB_RESULTS_DIR: str = os.getenv("JOB_RESULTS_DIR", "app/jobs/results")
+
+    # Finished upload jobs (and their transcripts) are deleted after this long
+    JOB_TTL_SECONDS: float = float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+    JOB_GC_INTERVAL_SECONDS: float = float(os.getenv("JOB_GC_INTERVAL_SECONDS", "3600"))
+    # Status long-poll / SSE: max wait per request, and how often other workers' updates are checked
+    JOB_STATUS_MAX_WAIT_SECONDS: float = float(os.getenv("JOB_STATUS_MAX_WAIT_SECONDS", "60"))
+    JOB_WATCH_POLL_SECONDS: float = float(os.getenv("JOB_WATCH_POLL_SECONDS", "2"))
+    # Processes refresh their active jobs' updated_at; a job on another host whose owner has been
+    # silent this long is treated as orphaned (e.g. a restarted pod with a new hostname)
+    JOB_OWNER_TIMEOUT_SECONDS: float = float(os.getenv("JOB_OWNER_TIMEOUT_SECONDS", "300"))
+
+    # "inline" = jobs run inside the API process, "queue" = the API only enqueues and
+    # separate worker processes (python -m app.worker) run them from the durable queue
+    JOB_EXECUTION_MODE: str = os.getenv("JOB_EXECUTION_MODE", "inline")
+    JOB_QUEUE_MAX_DEPTH: int = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "1000"))  # waiting jobs before 429
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # re-queued if no heartbeat in time
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # workers lost before a job is failed
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "0"))  # 0 = TRANSCRIPTION_WORKERS
+    WORKER_POLL_SECONDS: float = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+
+    # yt-dlp info dicts and caption listings per video are reused for this long
+    METADATA_CACHE_TTL_SECONDS: float = float(os.getenv("METADATA_CACHE_TTL_SECONDS", str(24 * 3600)))
+    # Caption lookups per video and language; "no captions" answers are rechecked sooner
+    CAPTION_CACHE_TTL_SECONDS: float = float(os.getenv("CAPTION_CACHE_TTL_SECONDS", str(24 * 3600)))
+    CAPTION_NEGATIVE_CACHE_TTL_SECONDS: float = float(os.getenv("CAPTION_NEGATIVE_CACHE_TTL_SECONDS", str(3600)))
+
+    # Videos allowed in each pipeline stage at once (per process); whisper 0 = TRANSCRIPTION_WORKERS
+    PIPELINE_CAPTION_CONCURRENCY: int = int(os.getenv("PIPELINE_CAPTION_CONCURRENCY", "16"))
+    PIPELINE_DOWNLOAD_CONCURRENCY: int = int(os.getenv("PIPELINE_DOWNLOAD_CONCURRENCY", "4"))
+    PIPELINE_WHISPER_CONCURRENCY: int = int(os.getenv("PIPELINE_WHISPER_CONCURRENCY", "0"))
+    # Audio format downloaded for Whisper when a request does not pick one:
+    # "native" keeps the source opus/m4a stream (no MP3 encode + decode), or mp3 / wav / aac / m4a
+    VIDEO_DOWNLOAD_FORMAT: str = os.getenv("VIDEO_DOWNLOAD_FORMAT", "native")
+    YTDLP_CONCURRENT_FRAGMENTS: int = int(os.getenv("YTDLP_CONCURRENT_FRAGMENTS", "4"))
+    # Downloaded audio is kept as a cache under DOWNLOAD_DIR; least-recently-used files go past this size
+    DOWNLOAD_CACHE_QUOTA_MB: int = int(os.getenv("DOWNLOAD_CACHE_QUOTA_MB", "5120"))
+    # Files used within this window are never evicted (protects files another worker process is reading)
+    DOWNLOAD_CACHE_MIN_IDLE_SECONDS: int = int(os.getenv("DOWNLOAD_CACHE_MIN_IDLE_SECONDS", "600"))
+    # Start the Whisper audio download while auto captions are validated: "off", "idle" (spare capacity only), "always"
+    VIDEO_SPECULATIVE_DOWNLOAD: str = os.getenv("VIDEO_SPECULATIVE_DOWNLOAD", "idle")
+    BATCH_MAX_VIDEOS: int = int(os.getenv("BATCH_MAX_VIDEOS", "500"))  # per batch / expanded playlist
+
+    # Finished /api/video/download results are reused for this long (captions may still change)
+    VIDEO_RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("VIDEO_RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+    # Upload jobs save decoded segments this often so a restart can resume mid-file
+    CHECKPOINT_INTERVAL_SECONDS: float = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "30"))
 
     # Cleaning settings
     CLEANING_MODEL: str = os.getenv("CLEANING_MODEL", "llama-3.1-8b-instant")
     MAX_CHUNK_SIZE: int = 2500  # characters per LLM chunk (reduced slightly for rate limits)
+
+    # Transcript validation
+    # Decide clearly good / clearly broken transcripts locally; only the ambiguous middle goes to the LLM
+    QUALITY_PREFILTER_ENABLED: bool = os.getenv("QUALITY_PREFILTER_ENABLED", "true").lower() == "true"
+    # Title/transcript relevance: "llm" (Groq), "embedding" (local model only), or "hybrid"
+    # (embedding decides outside the thresholds, LLM in between, embedding again if the LLM is down)
+    RELEVANCE_MODE: str = os.getenv("RELEVANCE_MODE", "hybrid")
+    # Cosine similarity of title vs transcript windows (multilingual MiniLM): related talks score
+    # well above ACCEPT, unrelated text below REJECT; "embedding" mode splits at the midpoint
+    RELEVANCE_ACCEPT_THRESHOLD: float = float(os.getenv("RELEVANCE_ACCEPT_THRESHOLD", "0.35"))
+    RELEVANCE_REJECT_THRESHOLD: float = float(os.getenv("RELEVANCE_REJECT_THRESHOLD", "0.15"))
+    RELEVANCE_WINDOWS: int = int(os.getenv("RELEVANCE_WINDOWS", "8"))  # transcript windows sampled
     
     # RAG Settings
     # Use absolute path for ChromaDB to avoid CWD issues
@@ -1,6 +1,12 @@
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import video, transcription, upload, clean, text_input, chat, pdf
+from app.config import settings
+from app.services.job_manager import job_manager
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="VidSage API")
 
@@ -22,6 +28,38 @@ app.include_router(chat.router)
 app.include_router(pdf.router)
 
 
+# Keeps a reference to the heartbeat task so it is not garbage-collected
+_background_tasks: set = set()
+
+
+@app.on_event("startup")
+async def start_job_heartbeat():
+    # Marks this process's jobs as alive, so other hosts only recover them once it is gone
+    task = asyncio.create_task(job_manager.run_owner_heartbeat())
+    _background_tasks.add(task)
+
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    # Upload jobs interrupted by a restart continue from their last checkpoint.
+    # In queue mode the workers' leases take care of this instead.
+    if settings.JOB_EXECUTION_MODE == "inline":
+        await upload.recover_interrupted_jobs()
+        # Again periodically: jobs of a pod that died elsewhere only look orphaned
+        # once their owner has been silent for JOB_OWNER_TIMEOUT_SECONDS
+        task = asyncio.create_task(_recover_periodically())
+        _background_tasks.add(task)
+
+
+async def _recover_periodically():
+    while True:
+        await asyncio.sleep(settings.JOB_OWNER_TIMEOUT_SECONDS / 2)
+        try:
+            await upload.recover_interrupted_jobs()
+        except Exception as e:
+            logger.warning(f"Job recovery failed: {e}")
+
+
 @app.get("/")
 async def root():
     return {"message": "VidSage API running"}
@@ -1,10 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 
 
 class TranscribeRequest(BaseModel):
     audio_path: str
     language: Optional[str] = None
+    model_size: Optional[str] = None    # e.g. "tiny" for a quick preview; None = server default
+    compute_type: Optional[str] = None  # e.g. "int8" or "float32"; None = server default
+    start: Optional[float] = Field(None, ge=0, description="Only transcribe from this second")
+    end: Optional[float] = Field(None, gt=0, description="Only transcribe up to this second")
+
+    @model_validator(mode="after")
+    def validate_range(self):
+        if self.start is not None and self.end is not None and self.end <= self.start:
+            raise ValueError("end must be greater than start")
+        return self
 
 
 class SegmentResponse(BaseModel):
@@ -18,4 +28,5 @@ class TranscribeResponse(BaseModel):
     text: str
     segments: List[SegmentResponse]
     language: str
-    duration: float
\ No newline at end of file
+    duration: float
+    model_size: Optional[str] = None  # model that actually ran (may be downgraded under load)
\ No newline at end of file
@@ -1,12 +1,15 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional
 import re
 
 
 class VideoRequest(BaseModel):
     video_url: str
-    output_format: Optional[str] = "mp3"
+    # None = VIDEO_DOWNLOAD_FORMAT ("native": original audio stream, no re-encode)
+    output_format: Optional[str] = None
     quality: Optional[str] = "192"
+    start: Optional[float] = Field(None, ge=0, description="Only process the video from this second")
+    end: Optional[float] = Field(None, gt=0, description="Only process the video up to this second")
 
     @field_validator("video_url")
     @classmethod
@@ -18,12 +21,49 @@ class VideoRequest(BaseModel):
 
     @field_validator("output_format")
     @classmethod
-    def validate_format(cls, v: str) -> str:
-        allowed = ["mp3", "wav", "aac", "m4a"]
+    def validate_format(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        allowed = ["native", "mp3", "wav", "aac", "m4a"]
         if v.lower() not in allowed:
             raise ValueError(f"Format must be one of {allowed}")
         return v.lower()
 
+    @model_validator(mode="after")
+    def validate_range(self):
+        if self.start is not None and self.end is not None and self.end <= self.start:
+            raise ValueError("end must be greater than start")
+        return self
+
+
+class BatchVideoRequest(BaseModel):
+    video_urls: List[str] = Field(default_factory=list, description="Videos to process")
+    playlist_url: Optional[str] = Field(None, description="Playlist or channel URL, expanded to its videos")
+    output_format: Optional[str] = None
+    quality: Optional[str] = "192"
+
+    @field_validator("video_urls")
+    @classmethod
+    def validate_urls(cls, v: List[str]) -> List[str]:
+        pattern = re.compile(r"^https?://.+")
+        for url in v:
+            if not pattern.match(url):
+                raise ValueError(f"Invalid URL format: {url}")
+        return list(dict.fromkeys(v))  # drop duplicates, keep order
+
+    @field_validator("playlist_url")
+    @classmethod
+    def validate_playlist_url(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and not re.match(r"^https?://.+", v):
+            raise ValueError("Invalid URL format")
+        return v
+
+    @model_validator(mode="after")
+    def validate_source(self):
+        if bool(self.video_urls) == bool(self.playlist_url):
+            raise ValueError("Give either video_urls or playlist_url")
+        return self
+
 
 class VideoResponse(BaseModel):
     success: bool
@@ -0,0 +1,59 @@
+"""
+Adaptive Model Policy - VidSage
+
+Picks a smaller Whisper model for a job when the transcription backlog grows,
+so latency degrades gracefully during spikes instead of snowballing into timeouts.
+Short clips always keep the configured model (they are cheap anyway), and jobs
+where the client explicitly chose a model are never touched by the scheduler.
+"""
+
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveModelPolicy:
+
+    # Smallest to largest; models outside this list are never downgraded
+    MODEL_LADDER: List[str] = ["tiny", "base", "small", "medium", "turbo", "large-v2", "large-v3"]
+
+    def __init__(
+        self,
+        available_models: List[str],
+        short_clip_seconds: float = 120.0,
+        queue_depth_per_step: int = 4,
+        long_audio_seconds: float = 1800.0
+    ):
+        # Only models the registry is allowed to load, smallest first
+        self.available_models = sorted(
+            (m for m in available_models if m in self.MODEL_LADDER),
+            key=self.MODEL_LADDER.index
+        )
+        self.short_clip_seconds = short_clip_seconds
+        self.queue_depth_per_step = max(1, queue_depth_per_step)
+        self.long_audio_seconds = long_audio_seconds
+
+    def choose(self, model_size: str, duration: float, queue_depth: int) -> str:
+        """
+        Returns the model to use for a job of `duration` seconds while `queue_depth`
+        jobs are still waiting behind it. One step down per queue_depth_per_step
+        waiting jobs, plus one more for long audio that would hold a worker for a while.
+        """
+        if duration < self.short_clip_seconds or model_size not in self.available_models:
+            return model_size
+
+        steps = queue_depth // self.queue_depth_per_step
+        if steps and duration >= self.long_audio_seconds:
+            steps += 1
+        if not steps:
+            return model_size
+
+        index = max(0, self.available_models.index(model_size) - steps)
+        chosen = self.available_models[index]
+        if chosen != model_size:
+            logger.info(
+                f"Queue depth {queue_depth}: downgrading {duration:.0f}s job "
+                f"from Whisper {model_size} to {chosen}"
+            )
+        return chosen
@@ -4,6 +4,7 @@ Handles file validation, chunked saving, and metadata extraction
 """
 
 import uuid
+import hashlib
 from pathlib import Path
 from dataclasses import dataclass
 from fastapi import UploadFile, HTTPException
@@ -17,6 +18,7 @@ class UploadResult:
     file_path: str
     original_filename: str
     file_size_mb: float
+    content_hash: str  # sha256 of the bytes, for detecting duplicate uploads
 
 
 class AudioUploaderService:
@@ -49,8 +51,9 @@ class AudioUploaderService:
         unique_name = f"{uuid.uuid4().hex}{extension}"
         save_path = self.UPLOAD_DIR / unique_name
 
-        # 3. Write file in chunks (memory-safe for large files)
+        # 3. Write file in chunks (memory-safe for large files), hashing as we go
         total_size = 0
+        hasher = hashlib.sha256()
 
         try:
             with open(save_path, "wb") as f:
@@ -67,6 +70,7 @@ class AudioUploaderService:
                         )
 
                     f.write(chunk)
+                    hasher.update(chunk)
 
         except HTTPException:
             raise
@@ -81,7 +85,8 @@ class AudioUploaderService:
         return UploadResult(
             file_path=str(save_path),
             original_filename=original_filename,
-            file_size_mb=file_size_mb
+            file_size_mb=file_size_mb,
+            content_hash=hasher.hexdigest()
         )
 
 
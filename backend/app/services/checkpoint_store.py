@@ -0,0 +1,135 @@
+"""
+Transcription Checkpoints - VidSage
+
+Long upload jobs periodically save the segments decoded so far (plus the last
+`end` timestamp) to disk. If the process restarts or the job crashes, a retried
+or recovered job resumes decoding from that offset and merges the results,
+instead of throwing hours of CPU time away.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import settings
+from app.services.transcription_service import TranscriptSegment, TranscriptionResult
+from app.utils.disk_cache import atomic_write_json
+from app.utils.segment_array import SegmentArray
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore:
+
+    def __init__(self, directory: str = "app/checkpoints"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def save(self, job_id: str, checkpoint: dict):
+        """Writes atomically (temp file + rename) so a crash never leaves a torn checkpoint."""
+        atomic_write_json(self._path(job_id), {**checkpoint, "updated_at": time.time()})
+
+    def load(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint for job {job_id}: {e}")
+            return None
+
+    def delete(self, job_id: str):
+        self._path(job_id).unlink(missing_ok=True)
+
+    def list_job_ids(self) -> List[str]:
+        return [p.stem for p in self.directory.glob("*.json")]
+
+
+def transcribe_resumable(
+    service,
+    job_id: str,
+    audio_path: str,
+    source_path: str,
+    store: Optional[CheckpointStore] = None,
+    interval: Optional[float] = None,
+    language: Optional[str] = None,
+    progress_callback=None
+) -> TranscriptionResult:
+    """
+    Runs service.transcribe on audio_path, resuming after the job's last checkpoint
+    and saving a new one every `interval` seconds of wall time.
+    source_path is the original upload (kept in the checkpoint for recovery),
+    audio_path the file actually decoded (e.g. the preprocessed WAV).
+    The language (given or auto-detected) is saved with the checkpoint, so a
+    resumed run decodes the rest in the same language instead of re-detecting it.
+    """
+    store = store or checkpoint_store
+    interval = settings.CHECKPOINT_INTERVAL_SECONDS if interval is None else interval
+
+    checkpoint = store.load(job_id) or {}
+    previous = SegmentArray.from_json(checkpoint.get("segments"))
+    resume_from = checkpoint.get("last_end", 0.0)
+    language = language or checkpoint.get("language")
+    if resume_from > 0:
+        logger.info(f"Resuming job {job_id} from {resume_from:.1f}s ({len(previous)} segments saved)")
+
+    state = {
+        "segments": list(checkpoint.get("segments", [])),
+        "last_end": resume_from,
+        "language": language,
+        "saved_at": time.monotonic()
+    }
+
+    def save():
+        store.save(job_id, {
+            "job_id": job_id,
+            "file_path": source_path,
+            "model_size": service.model_size,
+            "language": state["language"],
+            "segments": state["segments"],
+            "last_end": state["last_end"],
+        })
+        state["saved_at"] = time.monotonic()
+
+    def on_segment(segment: TranscriptSegment):
+        state["segments"].append({"start": segment.start, "end": segment.end, "text": segment.text})
+        state["last_end"] = segment.end
+        if time.monotonic() - state["saved_at"] >= interval:
+            save()
+
+    def on_language(detected: str):
+        if state["language"] != detected:
+            state["language"] = detected
+            save()  # pin it right away: the first segments may take a while
+
+    # Record the job up front so even a crash before the first interval is recoverable
+    save()
+
+    result = service.transcribe(
+        audio_path,
+        language=language,
+        progress_callback=progress_callback,
+        segment_callback=on_segment,
+        start_offset=resume_from,
+        language_callback=on_language
+    )
+
+    segments = SegmentArray.concat([previous, result.segments])
+    return TranscriptionResult(
+        text=segments.text,
+        segments=segments,
+        language=result.language,
+        duration=result.duration,
+        model_size=result.model_size,
+        compute_type=result.compute_type
+    )
+
+
+# Singleton instance
+checkpoint_store = CheckpointStore(settings.CHECKPOINT_DIR)
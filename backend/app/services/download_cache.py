@@ -0,0 +1,222 @@
+"""
+Download Cache - VidSage
+
+Turns app/downloads into a cache of downloaded audio:
+- a local hit skips yt-dlp entirely
+- downloads land in a staging directory and are moved in atomically, so a
+  crashed or cancelled download never leaves a half-written file behind
+- total size is capped by a quota; least-recently-used files are evicted
+- files in use are pinned with a marker file under .pins, so eviction in any
+  worker process skips them; files used in the last few minutes are skipped too
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# yt-dlp leftovers that are never complete audio files
+PARTIAL_SUFFIXES = (".part", ".ytdl", ".tmp", ".temp")
+STAGING_DIR_NAME = ".incoming"
+PINS_DIR_NAME = ".pins"
+PIN_SUFFIX = ".pin"
+
+
+class DownloadPin:
+    """
+    Keeps one cached file from being evicted until released. Use as a context
+    manager or call release(); releasing twice is harmless.
+    """
+
+    def __init__(self, path: Path, marker: Path):
+        self.path = path
+        self._marker = marker
+
+    def release(self):
+        if self._marker is not None:
+            self._marker.unlink(missing_ok=True)
+            self._marker = None
+
+    def __enter__(self) -> "DownloadPin":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class DownloadCache:
+
+    STALE_STAGING_SECONDS = 24 * 3600  # staging dirs / pin markers older than this belong to dead processes
+
+    def __init__(self, directory: str, quota_bytes: int, min_idle_seconds: float = 0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.staging_root = self.directory / STAGING_DIR_NAME
+        self.staging_root.mkdir(exist_ok=True)
+        self.pins_root = self.directory / PINS_DIR_NAME
+        self.pins_root.mkdir(exist_ok=True)
+        self.quota_bytes = quota_bytes
+        self.min_idle_seconds = min_idle_seconds
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._remove_stale()
+
+    def lookup(self, video_id: str, suffix: str = "", output_format: str = "native") -> Optional[DownloadPin]:
+        """
+        Returns the cached file for this video / range / format, already
+        pinned, or None. "native" matches whatever audio stream was stored
+        (webm, m4a...). A hit counts as a use for LRU eviction.
+        """
+        if output_format == "native":
+            candidates = [
+                p for p in self.directory.glob(f"{video_id}{suffix}.*")
+                if p.is_file() and p.suffix not in PARTIAL_SUFFIXES
+            ]
+        else:
+            candidate = self.directory / f"{video_id}{suffix}.{output_format}"
+            candidates = [candidate] if candidate.is_file() else []
+
+        pin = self.pin(candidates[0]) if candidates else None
+        if pin is not None:
+            try:
+                os.utime(pin.path)  # most recently used now
+            except OSError:
+                pin.release()  # evicted by another process before the pin landed
+                pin = None
+
+        with self._lock:
+            if pin is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return pin
+
+    def staging_dir(self) -> Path:
+        """A fresh directory for one download; discard it with shutil.rmtree when done."""
+        return Path(tempfile.mkdtemp(dir=self.staging_root))
+
+    def commit(self, staged_file: Path) -> DownloadPin:
+        """
+        Moves a finished download into the cache atomically, then enforces the
+        quota. The file comes back pinned, so the caller releases it when done.
+        """
+        final_path = self.directory / Path(staged_file).name
+        # Both before the move, so the file never shows up in the cache unpinned or
+        # looking old (yt-dlp may set the upload date as mtime; LRU needs "used now")
+        os.utime(staged_file)
+        pin = self.pin(final_path)
+        try:
+            os.replace(staged_file, final_path)
+        except BaseException:
+            pin.release()
+            raise
+        self.enforce_quota()
+        return pin
+
+    def pin(self, path) -> DownloadPin:
+        """Protects a file from eviction, in every process sharing the directory, until released."""
+        path = Path(path)
+        marker = self.pins_root / f"{path.name}.{uuid.uuid4().hex}{PIN_SUFFIX}"
+        marker.touch()
+        return DownloadPin(path, marker)
+
+    def _pinned_names(self) -> Set[str]:
+        return {
+            marker.name[:-len(PIN_SUFFIX)].rsplit(".", 1)[0]
+            for marker in self.pins_root.glob(f"*{PIN_SUFFIX}")
+        }
+
+    def enforce_quota(self):
+        """
+        Deletes least-recently-used files until the cache fits in the quota.
+        Pinned files and files used within min_idle_seconds are never deleted.
+        """
+        files = []
+        for path in self.directory.iterdir():
+            if not path.is_file() or path.suffix in PARTIAL_SUFFIXES:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # evicted by another process meanwhile
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        if total <= self.quota_bytes:
+            return
+
+        idle_cutoff = time.time() - self.min_idle_seconds
+        pinned = self._pinned_names()
+        for mtime, size, path in sorted(files):
+            if total <= self.quota_bytes:
+                break
+            if mtime >= idle_cutoff or path.name in pinned:
+                continue
+            with self._lock:
+                self.evictions += 1
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"Evicted {path.name} from download cache ({size / 1e6:.1f} MB)")
+
+    def stats(self) -> dict:
+        files = [
+            p for p in self.directory.iterdir()
+            if p.is_file() and p.suffix not in PARTIAL_SUFFIXES
+        ]
+        size = sum(p.stat().st_size for p in files if p.exists())
+        lookups = self.hits + self.misses
+        return {
+            "files": len(files),
+            "size_mb": round(size / (1024 * 1024), 1),
+            "quota_mb": round(self.quota_bytes / (1024 * 1024), 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "pinned": len(self._pinned_names()),
+        }
+
+    def _remove_stale(self):
+        cutoff = time.time() - self.STALE_STAGING_SECONDS
+        for path in self.staging_root.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+        for marker in self.pins_root.glob(f"*{PIN_SUFFIX}"):
+            try:
+                if marker.stat().st_mtime < cutoff:
+                    marker.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+
+
+# One cache per directory, shared by every VideoDownloaderService using it
+_caches: Dict[Path, DownloadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_download_cache(directory: str = settings.DOWNLOAD_DIR) -> DownloadCache:
+    key = Path(directory).resolve()
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = DownloadCache(
+                directory,
+                settings.DOWNLOAD_CACHE_QUOTA_MB * 1024 * 1024,
+                min_idle_seconds=settings.DOWNLOAD_CACHE_MIN_IDLE_SECONDS
+            )
+        return _caches[key]
@@ -1,48 +1,412 @@
+"""
+Job Store - VidSage
 
-# Simple In-Memory Job Manager Tracks transcription jobs and their status
+Tracks upload transcription jobs in SQLite (WAL mode), so jobs survive
+restarts and every uvicorn worker sees the same jobs. Only small job metadata
+lives in the database; finished transcripts are written to one JSON file per
+job and read back only when /result asks for them, so process memory stays
+flat. Finished jobs expire after a TTL and are garbage-collected.
 
+Every change bumps the job's `version`, so status clients can long-poll /
+stream and only wake up when their job actually changed.
+"""
 
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.utils.disk_cache import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed")
+ACTIVE_STATUSES = ("pending", "processing")
+
+# Distinguishes this process from an earlier one that had the same pid (e.g. in containers)
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    error TEXT,
+    has_result INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    updated_at REAL NOT NULL,
+    stage TEXT,
+    progress INTEGER NOT NULL DEFAULT 0,
+    eta_seconds REAL,
+    version INTEGER NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL DEFAULT 'upload',
+    batch_id TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+# Columns added after the first release of the table (older databases are migrated)
+_ADDED_COLUMNS = {
+    "stage": "TEXT",
+    "progress": "INTEGER NOT NULL DEFAULT 0",
+    "eta_seconds": "REAL",
+    "version": "INTEGER NOT NULL DEFAULT 0",
+    "kind": "TEXT NOT NULL DEFAULT 'upload'",
+    "batch_id": "TEXT",
+    "payload": "TEXT",
+}
+
+
+def current_owner() -> str:
+    """Identifies the process running a job: host:pid:token."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_PROCESS_TOKEN}"
+
+
+def _owner_alive(owner: Optional[str], updated_at: Optional[float], timeout_seconds: float) -> bool:
+    """
+    False when the owning process is gone: on this host, its pid is not running;
+    on another host (no pid check possible), it stopped refreshing the job's
+    updated_at more than timeout_seconds ago.
+    """
+    if not owner:
+        return False
+    if owner == current_owner():
+        return True
+
+    host, pid, _ = (owner.split(":") + ["", ""])[:3]
+    if host != socket.gethostname():
+        return time.time() - (updated_at or 0) < timeout_seconds
+    if not pid.isdigit() or int(pid) == os.getpid():
+        return False  # our pid, but an earlier process
+    if os.name == "nt":
+        return False  # no cheap liveness check; Windows setups run a single process
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
 
 
 class JobManager:
-    def __init__(self):
-        self.jobs: Dict[str, Dict[str, Any]] = {}
-
-    def create_job(self, file_path: str) -> str:
-        job_id = uuid.uuid4().hex
-        self.jobs[job_id] = {
-            "job_id": job_id,
-            "file_path": file_path,
-            "status": "pending",
-            "created_at": datetime.now().isoformat(),
-            "completed_at": None,
-            "result": None,
-            "error": None
-        }
+
+    def __init__(
+        self,
+        db_path: str = "app/jobs/jobs.db",
+        results_dir: str = "app/jobs/results",
+        ttl_seconds: float = 7 * 24 * 3600,
+        gc_interval_seconds: float = 3600,
+        watch_poll_seconds: float = 2.0,
+        owner_timeout_seconds: float = 300
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.results_dir = Path(results_dir)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.gc_interval_seconds = gc_interval_seconds
+        # Waiters re-read the database this often to see changes made by other processes
+        self.watch_poll_seconds = watch_poll_seconds
+        self.owner_timeout_seconds = owner_timeout_seconds
+
+        self._local = threading.local()  # one connection per thread
+        self._last_gc = 0.0
+
+        # job_id -> events of status clients waiting in this process (set from any thread)
+        self._waiters: Dict[str, set] = {}
+        self._waiters_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")  # readers never block the writer
+        conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, far fewer fsyncs
+            self._local.conn = conn
+        return conn
+
+    def _result_path(self, job_id: str) -> Path:
+        return self.results_dir / f"{job_id}.json"
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._conn().execute(
+            f"UPDATE jobs SET {columns}, version = version + 1 WHERE job_id = ?",
+            (*fields.values(), job_id)
+        )
+        self._notify(job_id)
+
+    def create_job(
+        self,
+        file_path: str,
+        job_id: Optional[str] = None,
+        kind: str = "upload",
+        batch_id: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        file_path is the uploaded file, or the video URL for kind="video".
+        job_id is passed when re-creating a job recovered from a checkpoint.
+        payload: the request needed to run the job again after a restart (e.g. a VideoRequest).
+        """
+        job_id = job_id or uuid.uuid4().hex
+        self._conn().execute(
+            """
+            INSERT INTO jobs (job_id, file_path, status, created_at, owner, updated_at, stage, kind, batch_id, payload)
+            VALUES (?, ?, 'pending', ?, ?, ?, 'queued', ?, ?, ?)
+            ON CONFLICT (job_id) DO UPDATE SET
+                file_path = excluded.file_path, status = 'pending', error = NULL,
+                completed_at = NULL, owner = excluded.owner, updated_at = excluded.updated_at,
+                stage = 'queued', progress = 0, eta_seconds = NULL, version = version + 1,
+                payload = excluded.payload
+            """,
+            (
+                job_id, file_path, datetime.now().isoformat(), current_owner(), time.time(), kind, batch_id,
+                json.dumps(payload) if payload is not None else None
+            )
+        )
+        self._notify(job_id)
+        self._maybe_collect_garbage()
         return job_id
 
-    def update_status(self, job_id: str, status: str):
-        if job_id in self.jobs:
-            self.jobs[job_id]["status"] = status
+    def claim_job(self, job_id: str, file_path: str, kind: str) -> bool:
+        """
+        Cross-process mutex on a well-known job_id: creates (or takes over) the job
+        for this process unless another live process has it pending/processing.
+        True when this process now owns it; losers wait for it with wait_for_change.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # the check and the write are one atomic step
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is not None and row["status"] in ACTIVE_STATUSES and self.owner_alive(dict(row)):
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                """
+                INSERT INTO jobs (job_id, file_path, status, created_at, owner, updated_at, stage, kind)
+                VALUES (?, ?, 'processing', ?, ?, ?, 'processing', ?)
+                ON CONFLICT (job_id) DO UPDATE SET
+                    file_path = excluded.file_path, status = 'processing', error = NULL,
+                    completed_at = NULL, has_result = 0, owner = excluded.owner,
+                    updated_at = excluded.updated_at, stage = 'processing', progress = 0,
+                    eta_seconds = NULL, version = version + 1
+                """,
+                (job_id, file_path, datetime.now().isoformat(), current_owner(), time.time(), kind)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._notify(job_id)
+        return True
+
+    def owner_alive(self, job: Dict[str, Any]) -> bool:
+        """Whether the process that owns the job is still running (see _owner_alive)."""
+        return _owner_alive(job.get("owner"), job.get("updated_at"), self.owner_timeout_seconds)
+
+    def update_status(self, job_id: str, status: str, stage: Optional[str] = None):
+        self._update(job_id, status=status, stage=stage or status)
+
+    def update_progress(
+        self,
+        job_id: str,
+        progress: int,
+        stage: Optional[str] = None,
+        eta_seconds: Optional[float] = None
+    ):
+        """Records progress percent (0-100) of the current stage and the estimated seconds left."""
+        fields = {"progress": progress, "eta_seconds": eta_seconds}
+        if stage:
+            fields["stage"] = stage
+        self._update(job_id, **fields)
 
     def complete_job(self, job_id: str, result: Any):
-        if job_id in self.jobs:
-            self.jobs[job_id]["status"] = "completed"
-            self.jobs[job_id]["completed_at"] = datetime.now().isoformat()
-            self.jobs[job_id]["result"] = result
+        # Result first, so a completed job always has its file
+        atomic_write_json(self._result_path(job_id), result)
+        self._update(
+            job_id, status="completed", stage="completed", progress=100, eta_seconds=0,
+            completed_at=datetime.now().isoformat(), has_result=1
+        )
 
     def fail_job(self, job_id: str, error: str):
-        if job_id in self.jobs:
-            self.jobs[job_id]["status"] = "failed"
-            self.jobs[job_id]["error"] = error
-            self.jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        self._update(
+            job_id, status="failed", stage="failed", eta_seconds=None,
+            error=error, completed_at=datetime.now().isoformat()
+        )
+
+    def requeue_job(self, job_id: str):
+        self._update(
+            job_id, status="pending", stage="queued", progress=0, eta_seconds=None,
+            error=None, completed_at=None, owner=current_owner()
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job metadata without the transcript (see get_result)."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_result(self, job_id: str) -> Optional[Any]:
+        """Loads a finished job's result from disk, or None if there is none (yet)."""
+        try:
+            with open(self._result_path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    async def wait_for_change(self, job_id: str, since_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: returns the job as soon as its version differs from since_version,
+        or the unchanged job after `timeout` seconds (None if the job does not exist).
+        Updates from this process wake waiters immediately; updates from other
+        processes are picked up within watch_poll_seconds.
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        deadline = loop.time() + timeout
+
+        with self._waiters_lock:
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            while True:
+                event.clear()  # before reading, so an update in between is not missed
+                job = self.get_job(job_id)
+                remaining = deadline - loop.time()
+                if job is None or job["version"] != since_version or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.watch_poll_seconds))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+
+    def _notify(self, job_id: str):
+        with self._waiters_lock:
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def list_jobs(self, statuses: tuple = ACTIVE_STATUSES, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Oldest first (served by the (status, created_at) index)."""
+        placeholders = ", ".join("?" for _ in statuses)
+        rows = self._conn().execute(
+            f"SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at LIMIT ?",
+            (*statuses, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_batch_jobs(self, batch_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at", (batch_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def touch_owned_jobs(self) -> int:
+        """
+        Refreshes updated_at of this process's active jobs (without bumping their
+        version), so other hosts can tell it is alive. Returns how many were touched.
+        """
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET updated_at = ? WHERE owner = ? AND status IN ({placeholders})",
+            (time.time(), current_owner(), *ACTIVE_STATUSES)
+        )
+        return cursor.rowcount
+
+    async def run_owner_heartbeat(self):
+        """Calls touch_owned_jobs well within owner_timeout_seconds, forever (run as a task)."""
+        while True:
+            await asyncio.sleep(self.owner_timeout_seconds / 3)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.touch_owned_jobs)
+            except sqlite3.Error as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def claim_orphaned_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Takes over pending/processing jobs whose process has died (e.g. a restart).
+        The claim is atomic, so when several workers start together each job is
+        recovered by exactly one of them.
+        """
+        claimed = []
+        for job in self.list_jobs(ACTIVE_STATUSES):
+            if self.owner_alive(job):
+                continue
+            cursor = self._conn().execute(
+                "UPDATE jobs SET owner = ?, updated_at = ? WHERE job_id = ? AND owner IS ?",
+                (current_owner(), time.time(), job["job_id"], job["owner"])
+            )
+            if cursor.rowcount == 1:
+                claimed.append({**job, "owner": current_owner()})
+        return claimed
+
+    def collect_garbage(self) -> int:
+        """Deletes finished jobs (and their result files) older than the TTL. Returns how many."""
+        cutoff = time.time() - self.ttl_seconds
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        conn = self._conn()
+        expired = [
+            row["job_id"] for row in conn.execute(
+                f"SELECT job_id FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, cutoff)
+            )
+        ]
+        for job_id in expired:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._result_path(job_id).unlink(missing_ok=True)
+
+        if expired:
+            logger.info(f"Expired {len(expired)} finished jobs")
+        return len(expired)
 
-    def get_job(self, job_id: str):
-        return self.jobs.get(job_id)
+    def _maybe_collect_garbage(self):
+        now = time.monotonic()
+        if now - self._last_gc < self.gc_interval_seconds:
+            return
+        self._last_gc = now
+        try:
+            self.collect_garbage()
+        except sqlite3.Error as e:
+            logger.warning(f"Job garbage collection failed: {e}")
 
 
 # Singleton
-job_manager = JobManager()
\ No newline at end of file
+job_manager = JobManager(
+    db_path=settings.JOB_DB_PATH,
+    results_dir=settings.JOB_RESULTS_DIR,
+    ttl_seconds=settings.JOB_TTL_SECONDS,
+    gc_interval_seconds=settings.JOB_GC_INTERVAL_SECONDS,
+    watch_poll_seconds=settings.JOB_WATCH_POLL_SECONDS,
+    owner_timeout_seconds=settings.JOB_OWNER_TIMEOUT_SECONDS
+)
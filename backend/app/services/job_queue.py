@@ -0,0 +1,201 @@
+"""
+Durable Job Queue - VidSage
+
+A local work queue in SQLite (same database as the job store), so API
+processes only enqueue and separate worker processes (`python -m app.worker`)
+do the heavy lifting. No external broker is needed.
+
+A worker leases one item at a time and renews the lease with heartbeats while
+it runs. If a worker dies, its lease expires and the item is handed to another
+worker; upload jobs then resume from their transcription checkpoint. Items
+that keep killing workers are given up after max_attempts.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_queue (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    enqueued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_queue_ready ON job_queue (status, priority, enqueued_at);
+CREATE INDEX IF NOT EXISTS idx_job_queue_leases ON job_queue (status, lease_expires_at);
+"""
+
+
+class JobQueue:
+
+    def __init__(
+        self,
+        db_path: str = "app/jobs/jobs.db",
+        lease_seconds: float = 60,
+        max_attempts: int = 3
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._local = threading.local()  # one connection per thread
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict[str, Any], priority: float = 0.0):
+        """Adds (or re-adds) a job. Lower priority runs first, e.g. the audio duration."""
+        self._conn().execute(
+            """
+            INSERT INTO job_queue (job_id, kind, payload, priority, status, enqueued_at)
+            VALUES (?, ?, ?, ?, 'queued', ?)
+            ON CONFLICT (job_id) DO UPDATE SET
+                kind = excluded.kind, payload = excluded.payload, priority = excluded.priority,
+                status = 'queued', attempts = 0, lease_owner = NULL, lease_expires_at = NULL,
+                enqueued_at = excluded.enqueued_at
+            """,
+            (job_id, kind, json.dumps(payload), priority, time.time())
+        )
+
+    def lease(self, owner: str, kinds: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically takes the next queued item for `owner`, or returns None if there is none.
+        The item stays leased until complete() or until the lease expires without a heartbeat.
+        """
+        conn = self._conn()
+        kind_filter = ""
+        params: list = []
+        if kinds:
+            kind_filter = f"AND kind IN ({', '.join('?' for _ in kinds)})"
+            params = list(kinds)
+
+        # IMMEDIATE takes the write lock up front, so two workers never lease the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"""
+                SELECT * FROM job_queue WHERE status = 'queued' {kind_filter}
+                ORDER BY priority, enqueued_at LIMIT 1
+                """,
+                params
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                """
+                UPDATE job_queue SET status = 'leased', lease_owner = ?, lease_expires_at = ?,
+                    attempts = attempts + 1
+                WHERE job_id = ?
+                """,
+                (owner, time.time() + self.lease_seconds, row["job_id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        item = dict(row)
+        item["payload"] = json.loads(item["payload"])
+        item["attempts"] += 1
+        return item
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """Extends the lease. False if the lease was lost (expired and taken over)."""
+        cursor = self._conn().execute(
+            """
+            UPDATE job_queue SET lease_expires_at = ?
+            WHERE job_id = ? AND status = 'leased' AND lease_owner = ?
+            """,
+            (time.time() + self.lease_seconds, job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, owner: str):
+        """Removes a finished item (its outcome is recorded in the job store)."""
+        self._conn().execute(
+            "DELETE FROM job_queue WHERE job_id = ? AND lease_owner = ?",
+            (job_id, owner)
+        )
+
+    def requeue_expired(self) -> List[str]:
+        """
+        Puts items whose worker stopped heartbeating back in the queue.
+        Returns the job_ids given up on after max_attempts (the caller fails them).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute(
+                "SELECT job_id, attempts FROM job_queue WHERE status = 'leased' AND lease_expires_at < ?",
+                (now,)
+            ).fetchall()
+            abandoned = [row["job_id"] for row in expired if row["attempts"] >= self.max_attempts]
+            for row in expired:
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute("DELETE FROM job_queue WHERE job_id = ?", (row["job_id"],))
+                else:
+                    conn.execute(
+                        """
+                        UPDATE job_queue SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL
+                        WHERE job_id = ?
+                        """,
+                        (row["job_id"],)
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        requeued = len(expired) - len(abandoned)
+        if requeued:
+            logger.warning(f"Re-queued {requeued} jobs whose worker stopped responding")
+        return abandoned
+
+    def depth(self) -> int:
+        """Items waiting for a worker (not counting leased ones)."""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM job_queue WHERE status = 'queued'"
+        ).fetchone()[0]
+
+    def stats(self) -> dict:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) AS count FROM job_queue GROUP BY status"
+        ).fetchall()
+        counts = {row["status"]: row["count"] for row in rows}
+        return {"queued": counts.get("queued", 0), "leased": counts.get("leased", 0)}
+
+
+# Singleton instance
+job_queue = JobQueue(
+    db_path=settings.JOB_DB_PATH,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS
+)
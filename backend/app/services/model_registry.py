@@ -0,0 +1,153 @@
+"""
+Whisper Model Registry - VidSage
+
+Loads Whisper models lazily and keeps several (size, compute_type) variants
+resident at once, e.g. a cheap "tiny" model for previews next to "small"
+for full-quality runs. When the estimated RAM use goes over the budget, the
+least-recently-used model that is not currently transcribing is evicted.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.services.transcription_service import TranscriptionService
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str]  # (model_size, compute_type)
+
+
+class WhisperModelRegistry:
+
+    # Rough resident memory per model with int8 weights on CPU (MB)
+    MODEL_MEMORY_MB: Dict[str, int] = {
+        "tiny": 150,
+        "base": 250,
+        "small": 600,
+        "medium": 1500,
+        "large-v2": 3000,
+        "large-v3": 3000,
+        "turbo": 1800,
+    }
+    # Weight size relative to int8
+    COMPUTE_TYPE_FACTOR: Dict[str, float] = {
+        "int8": 1.0,
+        "int8_float16": 1.2,
+        "int8_float32": 1.2,
+        "float16": 2.0,
+        "float32": 4.0,
+    }
+
+    def __init__(
+        self,
+        default_model_size: str = "base",
+        default_compute_type: str = "int8",
+        memory_budget_mb: int = 2048,
+        allowed_model_sizes: Optional[List[str]] = None,
+        allowed_compute_types: Optional[List[str]] = None,
+        **service_kwargs
+    ):
+        self.default_model_size = default_model_size
+        self.default_compute_type = default_compute_type
+        self.memory_budget_mb = memory_budget_mb
+        self.allowed_model_sizes = allowed_model_sizes or [default_model_size]
+        self.allowed_compute_types = allowed_compute_types or [default_compute_type]
+        self.service_kwargs = service_kwargs  # device, engine, threads... passed to every model
+
+        self._models: "OrderedDict[ModelKey, TranscriptionService]" = OrderedDict()  # LRU first
+        self._in_use: Dict[ModelKey, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+
+    def resolve(self, model_size: Optional[str] = None, compute_type: Optional[str] = None) -> ModelKey:
+        """Fills in defaults and validates a requested model. Raises ValueError if not allowed."""
+        model_size = model_size or self.default_model_size
+        compute_type = compute_type or self.default_compute_type
+
+        if model_size not in self.allowed_model_sizes:
+            raise ValueError(f"Model size must be one of {self.allowed_model_sizes}")
+        if compute_type not in self.allowed_compute_types:
+            raise ValueError(f"Compute type must be one of {self.allowed_compute_types}")
+
+        return model_size, compute_type
+
+    def get(self, model_size: Optional[str] = None, compute_type: Optional[str] = None) -> TranscriptionService:
+        """Returns a loaded model, loading it on first use and evicting LRU models if over budget."""
+        key = self.resolve(model_size, compute_type)
+
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay usable meanwhile;
+        # the per-key lock makes concurrent first requests share one load.
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+
+            service = TranscriptionService(
+                model_size=key[0],
+                compute_type=key[1],
+                **self.service_kwargs
+            )
+
+            with self._lock:
+                self._models[key] = service
+                self._evict_over_budget(keep=key)
+            return service
+
+    @contextmanager
+    def lease(self, model_size: Optional[str] = None, compute_type: Optional[str] = None):
+        """Yields a model that cannot be evicted until the block exits."""
+        key = self.resolve(model_size, compute_type)
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            yield self.get(*key)
+        finally:
+            with self._lock:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+                self._evict_over_budget()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": [
+                    {"model_size": size, "compute_type": compute, "in_use": self._in_use.get((size, compute), 0)}
+                    for size, compute in self._models
+                ],
+                "estimated_memory_mb": self._resident_mb(),
+                "memory_budget_mb": self.memory_budget_mb,
+            }
+
+    # INTERNALS
+
+    def _estimate_mb(self, key: ModelKey) -> float:
+        size, compute = key
+        base = self.MODEL_MEMORY_MB.get(size, self.MODEL_MEMORY_MB["large-v3"])
+        return base * self.COMPUTE_TYPE_FACTOR.get(compute, 1.0)
+
+    def _resident_mb(self) -> float:
+        return sum(self._estimate_mb(key) for key in self._models)
+
+    def _evict_over_budget(self, keep: Optional[ModelKey] = None):
+        """Drops LRU models that are idle until the estimate fits. Caller holds self._lock."""
+        for key in list(self._models):
+            if self._resident_mb() <= self.memory_budget_mb:
+                return
+            if key == keep or self._in_use.get(key):
+                continue
+            logger.info(f"Evicting Whisper model {key[0]}/{key[1]} (over {self.memory_budget_mb} MB budget)")
+            self._models.pop(key).close()
+
+        if self._resident_mb() > self.memory_budget_mb:
+            logger.warning("Whisper models in use exceed the memory budget; eviction deferred")
@@ -4,6 +4,8 @@ from sentence_transformers import SentenceTransformer
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from groq import Groq
 from app.config import settings
+from app.utils.segment_array import SegmentArray
+from typing import Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,44 +26,37 @@ class RAGService:
         # 3. Initialize "Logic" (LLM)
         self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
         
-    def index_video(self, video_id: str, segments: list[dict]):
+    def index_video(self, video_id: str, segments: Union[SegmentArray, list[dict]]):
         """
         TEACH MODE: Chunks the transcript SEGMENTS and saves it to Vector DB with timestamps.
-        segments format: [{"text": "...", "start": 0.0, "end": 10.0}, ...]
+        segments: a SegmentArray, or [{"text": "...", "start": 0.0, "end": 10.0}, ...]
         """
         logger.info(f"Indexing video {video_id} for RAG with timestamps...")
-        
+
+        if not isinstance(segments, SegmentArray):
+            segments = SegmentArray.from_dicts(segments)
+
         chunks = []
         metadatas = []
-        
-        current_chunk_text = []
-        current_chunk_start = 0.0
-        current_chunk_len = 0
-        
-        # 1. Group segments into chunks (~500 chars)
-        for i, seg in enumerate(segments):
-            text = seg.get("text", "")
-            start = seg.get("start", 0.0)
-            end = seg.get("end", 0.0)
-            
-            if not current_chunk_text:
-                current_chunk_start = start
-            
-            current_chunk_text.append(text)
-            current_chunk_len += len(text)
-            
+
+        # 1. Group segments into chunks (~500 chars); each chunk is one slice of the text buffer
+        chunk_start = 0
+        chunk_len = 0
+        lengths = segments.text_lengths().tolist()
+        for i, length in enumerate(lengths):
+            chunk_len += length
+
             # If chunk is big enough or this is the last segment
-            if current_chunk_len >= 500 or i == len(segments) - 1:
-                full_text = " ".join(current_chunk_text)
-                chunks.append(full_text)
+            if chunk_len >= 500 or i == len(lengths) - 1:
+                chunks.append(segments.text_between(chunk_start, i + 1))
                 metadatas.append({
-                    "start": current_chunk_start,
-                    "end": end
+                    "start": float(segments.starts[chunk_start]),
+                    "end": float(segments.ends[i])
                 })
-                
+
                 # Reset for next chunk
-                current_chunk_text = []
-                current_chunk_len = 0
+                chunk_start = i + 1
+                chunk_len = 0
 
         if not chunks:
             logger.warning(f"No chunks created for video {video_id}")
@@ -0,0 +1,49 @@
+"""
+Content-Addressed Transcript Cache - VidSage
+
+The same lecture uploaded by several students has the same bytes, so finished
+transcripts are cached by (content hash, model size, compute type, language). A duplicate
+upload completes instantly instead of being transcribed again.
+"""
+
+import logging
+from typing import Optional
+
+from app.config import settings
+from app.utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptCache:
+
+    def __init__(self, directory: str):
+        self.cache = DiskCache(directory)  # transcripts of identical bytes never go stale
+
+    @staticmethod
+    def make_key(content_hash: str, model_size: str, compute_type: str, language: Optional[str]) -> str:
+        return f"{content_hash}:{model_size}:{compute_type}:{language or 'auto'}"
+
+    def get(
+        self,
+        content_hash: str,
+        model_size: str,
+        compute_type: str,
+        language: Optional[str] = None
+    ) -> Optional[dict]:
+        """Returns the cached job result (transcript + cleaned output), or None."""
+        result = self.cache.get(self.make_key(content_hash, model_size, compute_type, language))
+        if result is not None:
+            logger.info(
+                f"Transcript cache hit for {content_hash[:12]} "
+                f"({model_size}, {compute_type}, {language or 'auto'})"
+            )
+        return result
+
+    def put(self, content_hash: str, model_size: str, compute_type: str, language: Optional[str], result: dict):
+        """Stores a finished job result under the model and compute type that actually produced it."""
+        self.cache.set(self.make_key(content_hash, model_size, compute_type, language), result)
+
+
+# Singleton instance
+transcript_cache = TranscriptCache(settings.TRANSCRIPT_CACHE_DIR)
@@ -3,17 +3,132 @@
 Transcript Quality Checker
 
 Validates auto-generated transcripts against the video's title to ensure content relevance.
-This service uses an LLM to determine if the transcript content matches the provided video title,
-filtering out hallucinations or irrelevant auto-generated text.
+Cheap local signals (compression ratio, repeated n-grams, type/token ratio, script
+consistency) settle the obvious cases, and title relevance is scored locally with the
+RAG embedding model (RELEVANCE_MODE). Only transcripts in the ambiguous middle band
+go to an LLM, which decides whether the content matches the provided video title.
 """
 
 import json
 import logging
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Optional, Tuple
 from groq import Groq
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Scripts grouped so that e.g. Japanese kanji + kana count as one writing system
+_SCRIPT_FAMILIES = {"HIRAGANA": "CJK", "KATAKANA": "CJK", "CJK": "CJK"}
+
+# Expected script per caption language (languages not listed are not checked)
+_LANGUAGE_SCRIPTS = {
+    "en": "LATIN", "es": "LATIN", "de": "LATIN", "fr": "LATIN", "pt": "LATIN", "it": "LATIN",
+    "hi": "DEVANAGARI", "mr": "DEVANAGARI", "ne": "DEVANAGARI",
+    "ja": "CJK", "zh": "CJK", "ko": "HANGUL",
+    "ru": "CYRILLIC", "uk": "CYRILLIC", "ar": "ARABIC", "ur": "ARABIC", "fa": "ARABIC",
+}
+
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "how", "what",
+    "why", "is", "are", "my", "your", "this", "that", "vs", "part", "video", "official",
+}
+
+
+def _script_of(char: str) -> Optional[str]:
+    try:
+        script = unicodedata.name(char).split()[0]
+    except ValueError:
+        return None
+    return _SCRIPT_FAMILIES.get(script, script)
+
+
+def _windows(text: str, size: int, count: int) -> list:
+    """Up to `count` windows of `size` characters spread evenly over the text."""
+    if len(text) <= size:
+        return [text]
+    step = max(size, (len(text) - size) // max(count - 1, 1))
+    return [text[i:i + size] for i in range(0, len(text) - size + 1, step)][:count]
+
+
+def compute_quality_signals(transcript: str, language: Optional[str] = None) -> dict:
+    """
+    Local quality signals, computed on evenly spread windows so that a loop
+    anywhere in the transcript shows up (worst window wins):
+    - compression_ratio: bytes / zlib-compressed bytes; repetition loops compress very well
+    - repeated_ngram_ratio: share of word 4-grams already seen in the window
+    - type_token_ratio: distinct / total words per 100-word stretch (None for CJK, no word breaks)
+    - script_consistency: share of letters in the dominant script
+    - script_matches_language: dominant script is the one expected for `language` (None if unknown)
+    """
+    windows = _windows(transcript, TranscriptQualityChecker.WINDOW_CHARS, TranscriptQualityChecker.MAX_WINDOWS)
+
+    compression = []
+    repeated = []
+    ttr = []
+    for window in windows:
+        encoded = window.encode("utf-8")
+        compression.append(len(encoded) / max(len(zlib.compress(encoded)), 1))
+
+        words = _WORD_RE.findall(window.lower())
+        ngrams = list(zip(words, words[1:], words[2:], words[3:]))
+        if ngrams:
+            repeated.append(1 - len(set(ngrams)) / len(ngrams))
+        for i in range(0, len(words) - 99, 100):
+            ttr.append(len(set(words[i:i + 100])) / 100)
+
+    scripts = Counter(
+        script for char in transcript[:TranscriptQualityChecker.WINDOW_CHARS * TranscriptQualityChecker.MAX_WINDOWS]
+        if char.isalpha() and (script := _script_of(char))
+    )
+    total_letters = sum(scripts.values())
+    dominant_script, dominant_count = scripts.most_common(1)[0] if scripts else (None, 0)
+
+    expected_script = _LANGUAGE_SCRIPTS.get((language or "").split("-")[0].lower())
+    return {
+        "compression_ratio": round(max(compression), 3),
+        "repeated_ngram_ratio": round(max(repeated), 3) if repeated else 0.0,
+        "type_token_ratio": round(min(ttr), 3) if ttr and dominant_script != "CJK" else None,
+        "script_consistency": round(dominant_count / total_letters, 3) if total_letters else 0.0,
+        "dominant_script": dominant_script,
+        "script_matches_language": dominant_script == expected_script if expected_script else None,
+    }
+
+
+def embedding_relevance(transcript: str, title: str) -> dict:
+    """
+    Cosine similarity between the title and RELEVANCE_WINDOWS windows sampled across
+    the whole transcript, using the embedding model RAGService already holds.
+    The score is the mean of the better half of the windows, so an off-topic
+    intro / outro / sponsor segment does not sink an otherwise relevant video.
+    """
+    # Lazy: loading the RAG service loads the model (and ChromaDB)
+    from app.services.rag_service import rag_service
+
+    windows = _windows(
+        transcript, TranscriptQualityChecker.RELEVANCE_WINDOW_CHARS, settings.RELEVANCE_WINDOWS
+    )
+    embeddings = rag_service.embedding_model.encode([title] + windows, normalize_embeddings=True)
+    window_scores = sorted((embeddings[1:] @ embeddings[0]).tolist(), reverse=True)
+    best_half = window_scores[:max(1, (len(window_scores) + 1) // 2)]
+    return {
+        "score": round(sum(best_half) / len(best_half), 3),
+        "window_scores": [round(score, 3) for score in window_scores],
+    }
+
+
+def _title_overlap(transcript: str, title: str) -> float:
+    """Share of the distinct title keywords that appear in the transcript (0.0 without keywords)."""
+    keywords = {w for w in _WORD_RE.findall(title.lower()) if len(w) > 2 and w not in _STOPWORDS}
+    if not keywords:
+        return 0.0
+    words = set(_WORD_RE.findall(transcript.lower()))
+    return len(keywords & words) / len(keywords)
+
 def _get_validation_prompt(title: str, snippet: str) -> str:
     """Constructs the prompt for the validation LLM."""
     return f"""
@@ -36,22 +151,155 @@ def _get_validation_prompt(title: str, snippet: str) -> str:
     """
 
 class TranscriptQualityChecker:
-    
+
+    WINDOW_CHARS = 4000
+    MAX_WINDOWS = 8
+
+    # Clearly broken: any one of these
+    BAD_COMPRESSION_RATIO = 4.0      # natural captions stay well under this per window
+    BAD_REPEATED_NGRAM_RATIO = 0.5   # half the 4-grams are repeats: a decoding loop
+    BAD_TYPE_TOKEN_RATIO = 0.25
+    BAD_SCRIPT_CONSISTENCY = 0.6     # letters from many scripts: garbage
+
+    # Clearly good: all of these (plus most title keywords in the transcript)
+    GOOD_COMPRESSION_RATIO = 3.0
+    GOOD_REPEATED_NGRAM_RATIO = 0.15
+    GOOD_TYPE_TOKEN_RATIO = 0.45
+    GOOD_SCRIPT_CONSISTENCY = 0.9
+    GOOD_TITLE_OVERLAP = 0.5  # share of title keywords; one shared word is not "on topic"
+
+    # ~128 word pieces, the embedding model's input limit
+    RELEVANCE_WINDOW_CHARS = 500
+
     @staticmethod
-    def validate_transcript(transcript: str, video_title: str) -> dict:
+    def prefilter(transcript: str, video_title: str, language: Optional[str] = None) -> Optional[dict]:
         """
-        Validates if the transcript content aligns with the video title using an LLM.
+        Local verdict from the quality signals: a validation result when the
+        transcript is clearly good or clearly bad, None when it is ambiguous.
+        """
+        cls = TranscriptQualityChecker
+        signals = compute_quality_signals(transcript, language)
+        ttr = signals["type_token_ratio"]
+
+        problems = []
+        if signals["compression_ratio"] > cls.BAD_COMPRESSION_RATIO:
+            problems.append(f"highly repetitive text (compression ratio {signals['compression_ratio']})")
+        if signals["repeated_ngram_ratio"] > cls.BAD_REPEATED_NGRAM_RATIO:
+            problems.append(f"repeated phrase loops ({signals['repeated_ngram_ratio']:.0%} of 4-grams)")
+        if ttr is not None and ttr < cls.BAD_TYPE_TOKEN_RATIO:
+            problems.append(f"very small vocabulary (type/token ratio {ttr})")
+        if signals["script_consistency"] < cls.BAD_SCRIPT_CONSISTENCY:
+            problems.append(f"mixed writing systems ({signals['script_consistency']:.0%} in the main script)")
+        if problems:
+            return {"is_valid": False, "reason": "Local check: " + "; ".join(problems),
+                    "method": "heuristic", "signals": signals}
+
+        clearly_good = (
+            signals["compression_ratio"] <= cls.GOOD_COMPRESSION_RATIO
+            and signals["repeated_ngram_ratio"] <= cls.GOOD_REPEATED_NGRAM_RATIO
+            and ttr is not None and ttr >= cls.GOOD_TYPE_TOKEN_RATIO
+            and signals["script_consistency"] >= cls.GOOD_SCRIPT_CONSISTENCY
+            and signals["script_matches_language"] is not False
+            and _title_overlap(transcript, video_title) >= cls.GOOD_TITLE_OVERLAP  # on topic, at least lexically
+        )
+        if clearly_good:
+            return {"is_valid": True, "reason": "Local check: coherent text that mentions the title's topic",
+                    "method": "heuristic", "signals": signals}
+        return None
+
+    @staticmethod
+    def local_verdict(transcript: str, video_title: str, language: Optional[str] = None) -> Optional[dict]:
+        """
+        Everything decidable without the LLM: the quality prefilter, then embedding
+        relevance per RELEVANCE_MODE. Returns None when the LLM has to decide.
+        """
+        return TranscriptQualityChecker.local_assessment(transcript, video_title, language)[0]
+
+    @staticmethod
+    def local_assessment(
+        transcript: str,
+        video_title: str,
+        language: Optional[str] = None
+    ) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        local_verdict() plus the embedding relevance it computed (None if it did
+        not get that far), so an undecided caller can hand the score on to
+        validate_transcript() instead of embedding the transcript again.
+        """
+        if not transcript or len(transcript.strip()) < 50:
+            return {"is_valid": False, "reason": "Transcript is too short or empty."}, None
+
+        quality = None
+        if settings.QUALITY_PREFILTER_ENABLED:
+            quality = TranscriptQualityChecker.prefilter(transcript, video_title, language)
+            if quality is not None and not quality["is_valid"]:
+                return quality, None
+
+        if settings.RELEVANCE_MODE == "llm":
+            return quality, None
+
+        try:
+            relevance = embedding_relevance(transcript, video_title)
+        except Exception as e:
+            logger.warning(f"Embedding relevance unavailable: {e}")
+            return quality, None
+
+        score = relevance["score"]
+        accept = settings.RELEVANCE_ACCEPT_THRESHOLD
+        reject = settings.RELEVANCE_REJECT_THRESHOLD
+        if settings.RELEVANCE_MODE == "embedding":
+            is_valid = score >= (accept + reject) / 2
+        elif score >= accept:
+            is_valid = True
+        elif score < reject:
+            is_valid = False
+        else:
+            # Ambiguous relevance: a clean, on-topic-looking transcript still passes locally
+            if quality is not None:
+                quality["relevance"] = relevance
+            return quality, relevance
+
+        return {
+            "is_valid": is_valid,
+            "reason": f"Embedding relevance {score} ({'on' if is_valid else 'off'} topic for the title)",
+            "method": "embedding",
+            "relevance": relevance,
+        }, relevance
+
+    @staticmethod
+    def validate_transcript(
+        transcript: str,
+        video_title: str,
+        language: Optional[str] = None,
+        local_checks: bool = True,
+        relevance: Optional[dict] = None
+    ) -> dict:
+        """
+        Validates if the transcript content aligns with the video title. Clear cases are
+        decided locally (see local_verdict); the rest by an LLM.
 
         Args:
             transcript (str): The full transcript text.
             video_title (str): The title of the video.
+            language (str, optional): Caption language code, for the script consistency check.
+            local_checks (bool): False when the caller already ran local_verdict().
+            relevance (dict, optional): embedding_relevance() result the caller already
+                has (see local_assessment), reused if the LLM is unavailable.
 
         Returns:
-            dict: Validation result containing "is_valid" (bool) and "reason" (str).
+            dict: Validation result containing "is_valid" (bool), "reason" (str)
+            and "method" ("heuristic", "embedding" or "llm").
         """
         if not transcript or len(transcript.strip()) < 50:
              return {"is_valid": False, "reason": "Transcript is too short or empty."}
 
+        if local_checks:
+            local_result, local_relevance = TranscriptQualityChecker.local_assessment(transcript, video_title, language)
+            relevance = relevance or local_relevance
+            if local_result is not None:
+                logger.info(f"Validation decided locally: {local_result['reason']}")
+                return local_result
+
         # Validate based on the first 4000 characters, which is usually sufficient
         # to determine topic relevance and detect gross errors.
         snippet = transcript[:4000]
@@ -77,10 +325,25 @@ class TranscriptQualityChecker:
             result = json.loads(content)
             return {
                 "is_valid": result.get("is_valid", False),
-                "reason": result.get("reason", "validation_logic_decision")
+                "reason": result.get("reason", "validation_logic_decision"),
+                "method": "llm"
             }
 
         except Exception as e:
             logger.error(f"Transcript validation failed: {e}")
+            if settings.RELEVANCE_MODE != "llm":
+                # Groq down or rate-limiting: decide on embedding relevance instead of failing closed
+                try:
+                    if relevance is None:
+                        relevance = embedding_relevance(transcript, video_title)
+                    midpoint = (settings.RELEVANCE_ACCEPT_THRESHOLD + settings.RELEVANCE_REJECT_THRESHOLD) / 2
+                    return {
+                        "is_valid": relevance["score"] >= midpoint,
+                        "reason": f"LLM unavailable ({e}); embedding relevance {relevance['score']}",
+                        "method": "embedding",
+                        "relevance": relevance,
+                    }
+                except Exception as embedding_error:
+                    logger.error(f"Embedding relevance failed too: {embedding_error}")
             # Fail safe: if validation errors out, treat as invalid to trigger fallback mechanisms.
             return {"is_valid": False, "reason": f"Validation Error: {str(e)}"}
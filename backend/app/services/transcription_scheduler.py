@@ -0,0 +1,200 @@
+"""
+Transcription Scheduler - VidSage
+
+Every Whisper job goes through here instead of calling the model directly:
+- A fixed pool of worker threads shares the models (CTranslate2 runs them in parallel)
+- The queue is bounded; when it is full, submit() fails fast with HTTP 429 + Retry-After
+- Shortest job first (by probed audio duration), with aging so long jobs never starve
+- Callers await an asyncio future, so the event loop is never blocked
+- Under queue pressure, jobs without an explicit model may run on a smaller one
+  (see AdaptiveModelPolicy); the model actually used is reported in the result
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(HTTPException):
+    """Raised when the transcription queue has no free slot. Routes let it propagate as a 429."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail="Transcription queue is full. Please retry later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Job:
+    priority: float
+    seq: int
+    duration: float = field(compare=False)
+    model_key: tuple = field(compare=False)
+    pinned: bool = field(compare=False)  # client chose the model explicitly
+    func: Callable = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    loop: asyncio.AbstractEventLoop = field(compare=False)
+
+
+class TranscriptionScheduler:
+
+    UNKNOWN_DURATION = 600.0  # seconds assumed when the duration could not be probed
+    AGING_WEIGHT = 1.0        # each second of waiting counts as one second less audio
+    INITIAL_RTF = 0.5         # processing time per audio second until we have measurements
+
+    def __init__(self, registry, workers: int = 2, max_queue: int = 32, policy=None):
+        self.registry = registry
+        self.policy = policy  # optional AdaptiveModelPolicy
+        self.workers = workers
+        self.max_queue = max_queue
+
+        self._queue: list = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._epoch = time.monotonic()
+
+        # Audio seconds waiting / being decoded, used for the Retry-After estimate
+        self._queued_seconds = 0.0
+        self._running_seconds = 0.0
+        self._running = 0
+        self._realtime_factor = self.INITIAL_RTF
+
+        for i in range(workers):
+            threading.Thread(
+                target=self._worker_loop,
+                name=f"transcription-worker-{i}",
+                daemon=True
+            ).start()
+
+    # PUBLIC API
+
+    def check_capacity(self):
+        """Raises QueueFullError if a new job would be rejected. Lets routes fail before heavy work."""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise QueueFullError(self._retry_after())
+
+    def submit(
+        self,
+        func: Callable[[Any], Any],
+        duration: Optional[float] = None,
+        model_size: Optional[str] = None,
+        compute_type: Optional[str] = None
+    ) -> asyncio.Future:
+        """
+        Queues func(service) and returns a future resolved on the caller's event loop.
+        duration: audio length in seconds (used for shortest-job-first ordering).
+        model_size / compute_type: which registry model runs the job (None = default,
+        which the adaptive policy may downgrade when the queue is long).
+        Raises ValueError for a model that is not allowed.
+        """
+        model_key = self.registry.resolve(model_size, compute_type)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        duration = duration or self.UNKNOWN_DURATION
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise QueueFullError(self._retry_after())
+
+            # Aging: later arrivals get a larger key, so a long job eventually wins
+            waited_key = self.AGING_WEIGHT * (time.monotonic() - self._epoch)
+            heapq.heappush(
+                self._queue,
+                _Job(
+                    duration + waited_key, next(self._seq), duration,
+                    model_key, model_size is not None, func, future, loop
+                )
+            )
+            self._queued_seconds += duration
+            self._cond.notify()
+
+        return future
+
+    async def run(
+        self,
+        func: Callable[[Any], Any],
+        duration: Optional[float] = None,
+        model_size: Optional[str] = None,
+        compute_type: Optional[str] = None
+    ):
+        """Submits func(service) and waits for its result."""
+        return await self.submit(func, duration, model_size, compute_type)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "queued_audio_seconds": round(self._queued_seconds, 1),
+                "realtime_factor": round(self._realtime_factor, 3),
+            }
+
+    # INTERNALS
+
+    def _retry_after(self) -> int:
+        """Seconds until a queue slot is likely free, i.e. until the next worker finishes its job."""
+        average_job = self._running_seconds * self._realtime_factor / max(1, self._running)
+        return max(1, math.ceil(average_job / max(1, self.workers)))
+
+    def _choose_model(self, job: _Job, queue_depth: int) -> tuple:
+        """Applies the adaptive policy at dispatch time, when the backlog is known."""
+        if job.pinned or self.policy is None:
+            return job.model_key
+        model_size, compute_type = job.model_key
+        return self.policy.choose(model_size, job.duration, queue_depth), compute_type
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = heapq.heappop(self._queue)
+                self._queued_seconds -= job.duration
+                if job.future.cancelled():  # caller gave up while waiting
+                    continue
+                self._running_seconds += job.duration
+                self._running += 1
+                model_key = self._choose_model(job, queue_depth=len(self._queue))
+
+            started = time.monotonic()
+            try:
+                # Leased so the registry cannot evict the model mid-transcription
+                with self.registry.lease(*model_key) as service:
+                    result = job.func(service)
+                job.loop.call_soon_threadsafe(self._resolve, job.future, result, None)
+            except Exception as e:
+                logger.error(f"Transcription job failed: {e}")
+                job.loop.call_soon_threadsafe(self._resolve, job.future, None, e)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running_seconds -= job.duration
+                    self._running -= 1
+                    # Exponential moving average of processing speed
+                    rtf = elapsed / job.duration
+                    self._realtime_factor = 0.8 * self._realtime_factor + 0.2 * rtf
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result, error):
+        if future.done():  # caller went away (e.g. client disconnected)
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
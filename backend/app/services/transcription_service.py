@@ -1,14 +1,26 @@
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple, Union
 from dataclasses import dataclass
+import numpy as np
+import multiprocessing
 import logging
+import os
+
+from app.utils.audio_preprocess import stream_audio, load_audio, probe_duration
+from app.utils.segment_array import SegmentArray
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_RATE = 16000
+
 
 @dataclass
 class TranscriptSegment:
+    """A single segment, as streamed to segment_callback while decoding."""
     start: float
     end: float
     text: str
@@ -16,10 +28,42 @@ class TranscriptSegment:
 
 @dataclass
 class TranscriptionResult:
-    text: str
-    segments: List[TranscriptSegment]
+    text: str  # same string as segments.text
+    segments: SegmentArray
     language: str
     duration: float
+    model_size: Optional[str] = None  # model that actually produced the transcript
+    compute_type: Optional[str] = None
+
+
+# --- Parallel engine: per-process worker state ---
+# Each pool process loads its own WhisperModel once (in the initializer)
+# and reuses it for every chunk it receives.
+_worker_model: Optional[WhisperModel] = None
+
+
+def _init_worker(model_size: str, device: str, compute_type: str, cpu_threads: int):
+    global _worker_model
+    _worker_model = WhisperModel(
+        model_size,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads
+    )
+
+
+def _transcribe_chunk(audio, offset: float, language: str, beam_size: int = 5) -> List[Tuple[float, float, str]]:
+    """Transcribes one chunk in a pool process and shifts timestamps by its offset."""
+    segments_generator, _ = _worker_model.transcribe(
+        audio,
+        language=language,
+        beam_size=beam_size,
+        vad_filter=True
+    )
+    return [
+        (segment.start + offset, segment.end + offset, segment.text.strip())
+        for segment in segments_generator
+    ]
 
 
 class TranscriptionService:
@@ -28,43 +72,134 @@ class TranscriptionService:
         self,
         model_size: str = "base",
         device: str = "cpu",
-        compute_type: str = "int8"
+        compute_type: str = "int8",
+        engine: str = "standard",
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        beam_size: int = 5,
+        batch_size: int = 8,
+        parallel_workers: int = 0,
+        parallel_min_duration: float = 600.0,
+        window_seconds: float = 0.0,
+        window_overlap_seconds: float = 30.0
     ):
-        logger.info(f"Loading Faster-Whisper model: {model_size}")
+        logger.info(f"Loading Faster-Whisper model: {model_size} (engine: {engine})")
         self.model = WhisperModel(
             model_size,
             device=device,
-            compute_type=compute_type
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,  # 0 = faster-whisper default
+            num_workers=num_workers   # concurrent transcribe() calls from scheduler threads
         )
         self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.engine = engine
+        self.beam_size = beam_size  # 1 = greedy decoding (fastest)
+
+        # Batched engine: decodes several VAD chunks per forward pass
+        self.batch_size = batch_size
+        self.batched_pipeline = (
+            BatchedInferencePipeline(model=self.model) if engine == "batched" else None
+        )
+
+        # Parallel engine: one model instance per pool process (0 = one per CPU core)
+        self.parallel_workers = parallel_workers or os.cpu_count() or 1
+        self.parallel_min_duration = parallel_min_duration
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # Windowed mode: decode files in fixed windows so memory stays flat (0 = off)
+        self.window_seconds = window_seconds
+        self.window_overlap_seconds = window_overlap_seconds
         logger.info("Model loaded successfully!")
 
     def transcribe(
         self,
-        audio_path: str,
+        audio_path: Union[str, np.ndarray],
         language: Optional[str] = None,
-        progress_callback=None
+        progress_callback=None,
+        segment_callback=None,
+        start_offset: float = 0.0,
+        end_offset: Optional[float] = None,
+        language_callback=None
     ) -> TranscriptionResult:
+        """
+        audio_path: file path, or 16 kHz mono float32 samples already decoded in memory.
+        progress_callback(percent) is called in 5% steps of the decoded range.
+        segment_callback(TranscriptSegment) is called for every segment as soon as it is decoded.
+        language_callback(code) is called once, as soon as the language is known (given or detected).
+        start_offset / end_offset: only decode this time range in seconds (partial transcription,
+        or resuming a checkpointed job); returned timestamps stay absolute.
+        """
+        clipped = start_offset > 0 or end_offset is not None
+
+        if isinstance(audio_path, np.ndarray):
+            source = audio_path
+            audio_path = "<in-memory audio>"
+        else:
+            path = Path(audio_path)
+
+            if not path.exists():
+                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+            source = str(audio_path)
+
+            # Bounded memory: never hold more than two windows of samples
+            if self.window_seconds > 0:
+                return self._transcribe_windowed(
+                    source, language, progress_callback, segment_callback, start_offset, end_offset,
+                    language_callback
+                )
 
-        path = Path(audio_path)
+        time_offset = 0.0  # added to every timestamp when decoding a slice of the file
 
-        if not path.exists():
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        if clipped:
+            time_offset = start_offset
+            if isinstance(source, str):
+                # ffmpeg seeks to the range, so only that part is ever decoded
+                source = load_audio(source, start=start_offset, end=end_offset, normalize=False)
+            else:
+                end_sample = int(end_offset * SAMPLE_RATE) if end_offset is not None else None
+                source = source[int(start_offset * SAMPLE_RATE):end_sample]
+        elif self.engine == "parallel" and isinstance(source, str):
+            # Decode once; the samples are reused by whichever engine runs below
+            source = decode_audio(source, sampling_rate=SAMPLE_RATE)
+
+        if (
+            self.engine == "parallel"
+            and self.parallel_workers > 1
+            and len(source) / SAMPLE_RATE >= self.parallel_min_duration
+        ):
+            return self._transcribe_parallel(
+                source, language, progress_callback, segment_callback, time_offset, language_callback
+            )
 
         # Debug: Indicate start of transcription loop
         print(f"[DEBUG] Starting transcription loop for: {audio_path}", flush=True)
 
-        segments_generator, info = self.model.transcribe(
-            str(audio_path),
-            language=language,
-            vad_filter=True
-        )
+        if self.batched_pipeline is not None:
+            segments_generator, info = self.batched_pipeline.transcribe(
+                source,
+                language=language,
+                beam_size=self.beam_size,
+                vad_filter=True,
+                batch_size=self.batch_size
+            )
+        else:
+            segments_generator, info = self.model.transcribe(
+                source,
+                language=language,
+                beam_size=self.beam_size,
+                vad_filter=True
+            )
 
-        segments = []
-        full_text = []
+        if language_callback:
+            language_callback(info.language)
+
+        starts, ends, texts = [], [], []
 
         # Estimate total duration for progress (fallback to 0 if not available)
-        total_duration = getattr(info, 'duration', 0) or 0
+        decoded_duration = getattr(info, 'duration', 0) or 0
         last_percent = -1
 
         # Always print 0% at start
@@ -72,18 +207,18 @@ class TranscriptionService:
             progress_callback(0)
 
         for segment in segments_generator:
-            segments.append(
-                TranscriptSegment(
-                    start=segment.start,
-                    end=segment.end,
-                    text=segment.text.strip()
-                )
-            )
-            full_text.append(segment.text.strip())
+            start, end, text = segment.start + time_offset, segment.end + time_offset, segment.text.strip()
+            starts.append(start)
+            ends.append(end)
+            texts.append(text)
+
+            if segment_callback:
+                segment_callback(TranscriptSegment(start=start, end=end, text=text))
 
             # Progress reporting
-            if total_duration > 0 and progress_callback:
-                percent = int(100 * min(segment.end, total_duration) / total_duration)
+            if decoded_duration > 0 and progress_callback:
+                decoded = min(segment.end, decoded_duration)
+                percent = int(100 * decoded / decoded_duration)
                 if percent != last_percent and percent % 5 == 0:
                     progress_callback(percent)
                     last_percent = percent
@@ -92,9 +227,252 @@ class TranscriptionService:
         if progress_callback:
             progress_callback(100)
 
+        segments = SegmentArray.from_columns(starts, ends, texts)
         return TranscriptionResult(
-            text=" ".join(full_text),
+            text=segments.text,
             segments=segments,
             language=info.language,
-            duration=info.duration
-        )
\ No newline at end of file
+            duration=time_offset + decoded_duration,  # absolute end of the decoded audio
+            model_size=self.model_size,
+            compute_type=self.compute_type
+        )
+
+    def close(self):
+        """Stops the parallel worker processes (if started). The model itself is freed by GC."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # WINDOWED DECODING
+
+    def _transcribe_windowed(
+        self,
+        audio_path: str,
+        language: Optional[str],
+        progress_callback=None,
+        segment_callback=None,
+        start_offset: float = 0.0,
+        end_offset: Optional[float] = None,
+        language_callback=None
+    ) -> TranscriptionResult:
+        """
+        Transcribes fixed-size overlapping windows streamed from ffmpeg.
+        Segments starting inside a window's overlap tail are left to the next
+        window, which sees them with full context; the tail text of each window
+        is passed as initial_prompt so wording stays consistent across cuts.
+        """
+        total_duration = end_offset if end_offset is not None else probe_duration(audio_path)
+        engine = self.batched_pipeline or self.model
+        engine_kwargs = {"batch_size": self.batch_size} if self.batched_pipeline else {}
+
+        logger.info(
+            f"Windowed transcription of {audio_path}: "
+            f"{self.window_seconds:.0f}s windows, {self.window_overlap_seconds:.0f}s overlap"
+        )
+
+        starts, ends, texts = [], [], []
+        committed_end = start_offset
+        prompt = None
+        last_percent = -1
+        end_of_audio = start_offset
+
+        if language and language_callback:
+            language_callback(language)
+
+        if progress_callback:
+            progress_callback(0)
+
+        for offset, samples, is_last in stream_audio(
+            audio_path, self.window_seconds, self.window_overlap_seconds,
+            start=start_offset, end=end_offset
+        ):
+            window_end = offset + len(samples) / SAMPLE_RATE
+            tail_start = window_end - self.window_overlap_seconds
+            end_of_audio = window_end
+
+            segments_generator, info = engine.transcribe(
+                samples,
+                language=language,
+                beam_size=self.beam_size,
+                vad_filter=True,
+                initial_prompt=prompt,
+                **engine_kwargs
+            )
+            # Lock the language after the first window so all windows agree
+            if language is None and language_callback:
+                language_callback(info.language)
+            language = language or info.language
+
+            for segment in segments_generator:
+                start, end = segment.start + offset, segment.end + offset
+                if start < committed_end - 0.1:
+                    continue  # already transcribed by the previous window
+                if not is_last and start >= tail_start:
+                    break     # the next window re-decodes this with more context
+
+                text = segment.text.strip()
+                starts.append(start)
+                ends.append(end)
+                texts.append(text)
+                committed_end = end
+
+                if segment_callback:
+                    segment_callback(TranscriptSegment(start=start, end=end, text=text))
+
+            prompt = " ".join(texts[-3:]) or None
+
+            # Progress reporting
+            if total_duration > start_offset and progress_callback:
+                decoded = min(committed_end, total_duration) - start_offset
+                percent = int(100 * decoded / (total_duration - start_offset))
+                percent -= percent % 5
+                if percent != last_percent and percent < 100:
+                    progress_callback(percent)
+                    last_percent = percent
+
+        if progress_callback:
+            progress_callback(100)
+
+        segments = SegmentArray.from_columns(starts, ends, texts)
+        return TranscriptionResult(
+            text=segments.text,
+            segments=segments,
+            language=language,
+            duration=total_duration or end_of_audio,
+            model_size=self.model_size,
+            compute_type=self.compute_type
+        )
+
+    # PARALLEL ENGINE
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Starts the worker processes on first use; each one loads its own model."""
+        if self._pool is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // self.parallel_workers)
+            logger.info(
+                f"Starting {self.parallel_workers} Whisper workers "
+                f"({cpu_threads} CPU threads each)"
+            )
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.parallel_workers,
+                # spawn: CTranslate2 thread pools do not survive a fork
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_size, self.device, self.compute_type, cpu_threads)
+            )
+        return self._pool
+
+    def _plan_chunks(self, audio) -> List[Tuple[int, int]]:
+        """
+        Splits audio into roughly equal chunks, cutting only in the middle of
+        silences found by VAD so that no word is split across two workers.
+        Returns (start_sample, end_sample) pairs covering the whole file.
+        """
+        total_samples = len(audio)
+        # Two chunks per worker keeps all workers busy when chunk speeds differ
+        target = total_samples // (self.parallel_workers * 2)
+
+        speech = get_speech_timestamps(
+            audio,
+            VadOptions(min_silence_duration_ms=500),
+            sampling_rate=SAMPLE_RATE
+        )
+
+        chunks = []
+        chunk_start = 0
+        for current, following in zip(speech, speech[1:]):
+            if following["start"] - chunk_start < target:
+                continue
+            cut = (current["end"] + following["start"]) // 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+
+        chunks.append((chunk_start, total_samples))
+        return chunks
+
+    def _transcribe_parallel(
+        self,
+        audio,
+        language: Optional[str],
+        progress_callback=None,
+        segment_callback=None,
+        time_offset: float = 0.0,
+        language_callback=None
+    ) -> TranscriptionResult:
+        duration = len(audio) / SAMPLE_RATE + time_offset
+        chunks = self._plan_chunks(audio)
+        logger.info(
+            f"Parallel transcription: {len(chunks)} chunks on "
+            f"{self.parallel_workers} workers ({duration:.1f}s audio)"
+        )
+
+        # Detect the language once on the first chunk so every worker agrees.
+        # faster-whisper detects eagerly, so no segments are decoded here.
+        if language is None:
+            first_start, first_end = chunks[0]
+            _, info = self.model.transcribe(
+                audio[first_start:first_end],
+                vad_filter=True
+            )
+            language = info.language
+
+        if language_callback:
+            language_callback(language)
+
+        if progress_callback:
+            progress_callback(0)
+
+        pool = self._get_pool()
+        futures = {
+            pool.submit(
+                _transcribe_chunk,
+                audio[start:end],
+                start / SAMPLE_RATE + time_offset,
+                language,
+                self.beam_size
+            ): (start, end)
+            for start, end in chunks
+        }
+
+        results = {}
+        done_samples = 0
+        last_percent = 0
+        chunk_starts = [start for start, _ in chunks]
+        next_to_emit = 0
+
+        for future in as_completed(futures):
+            start, end = futures[future]
+            results[start] = future.result()
+
+            # Stream segments in time order: emit every chunk whose predecessors are done
+            while segment_callback and next_to_emit < len(chunk_starts) and chunk_starts[next_to_emit] in results:
+                for seg_start, seg_end, text in results[chunk_starts[next_to_emit]]:
+                    segment_callback(TranscriptSegment(start=seg_start, end=seg_end, text=text))
+                next_to_emit += 1
+
+            # Progress reporting (fraction of audio already transcribed)
+            done_samples += end - start
+            percent = int(100 * done_samples / len(audio))
+            percent -= percent % 5
+            if progress_callback and percent != last_percent and percent < 100:
+                progress_callback(percent)
+                last_percent = percent
+
+        # Stitch chunks back together in time order
+        segments = SegmentArray.from_tuples(
+            segment
+            for start in sorted(results)
+            for segment in results[start]
+        )
+
+        if progress_callback:
+            progress_callback(100)
+
+        return TranscriptionResult(
+            text=segments.text,
+            segments=segments,
+            language=language,
+            duration=duration,
+            model_size=self.model_size,
+            compute_type=self.compute_type
+        )
@@ -1,29 +1,110 @@
 import yt_dlp
+from yt_dlp.utils import download_range_func, DownloadCancelled
 import asyncio
+import shutil
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+from app.services.download_cache import DownloadPin, get_download_cache
+from app.utils.disk_cache import DiskCache
+
+# Trimmed yt-dlp info dicts by video id: repeat requests skip the metadata round-trip
+video_info_cache = DiskCache(
+    str(Path(settings.METADATA_CACHE_DIR) / "info"),
+    ttl_seconds=settings.METADATA_CACHE_TTL_SECONDS
+)
+
+# Fields kept from the (very large) yt-dlp info dict
+INFO_FIELDS = ("id", "title", "duration", "channel", "uploader", "language", "upload_date", "webpage_url")
 
 
 class VideoDownloaderService:
 
-    def __init__(self, download_dir: str = "app/downloads"):
+    # Keep the source audio stream as-is (opus/m4a): no lossy MP3 re-encode, Whisper decodes it directly
+    NATIVE_FORMAT = "native"
+
+    def __init__(self, download_dir: str = settings.DOWNLOAD_DIR):
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(parents=True, exist_ok=True)
+        # Finished downloads are kept (up to DOWNLOAD_CACHE_QUOTA_MB) and reused
+        self.cache = get_download_cache(str(self.download_dir))
 
-    def _get_ydl_opts(self, output_format: str, quality: str) -> Dict:
-        return {
+    @staticmethod
+    def _range_suffix(start: Optional[float], end: Optional[float]) -> str:
+        """File name suffix for partial downloads, so they never collide with the full audio."""
+        if start is None and end is None:
+            return ""
+        return f"_{int(start or 0)}-{int(end) if end is not None else 'end'}"
+
+    @staticmethod
+    def _section_duration(
+        duration: Optional[float],
+        start: Optional[float],
+        end: Optional[float]
+    ) -> Optional[float]:
+        """Length of the section actually downloaded (the whole video without a range)."""
+        if start is None and end is None:
+            return duration
+        section_end = end if end is not None and (duration is None or end < duration) else duration
+        return section_end - (start or 0) if section_end is not None else None
+
+    def _get_ydl_opts(
+        self,
+        output_format: str,
+        quality: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        target_dir: Optional[Path] = None
+    ) -> Dict:
+        opts = {
             "format": "bestaudio/best",
-            "postprocessors": [{
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": output_format,
-                "preferredquality": quality,
-            }],
-            "outtmpl": str(self.download_dir / "%(id)s.%(ext)s"),
+            "outtmpl": str((target_dir or self.download_dir) / f"%(id)s{self._range_suffix(start, end)}.%(ext)s"),
             "quiet": True,
             "no_warnings": True,
+            # Fetch DASH/HLS fragments in parallel instead of one by one
+            "concurrent_fragment_downloads": settings.YTDLP_CONCURRENT_FRAGMENTS,
         }
 
-    async def download_audio(self, url: str, output_format: str = "mp3", quality: str = "192") -> Dict[str, Any]:
+        if output_format == self.NATIVE_FORMAT:
+            # Smallest-overhead audio-only stream; opus (webm) and m4a both decode fine in Whisper
+            opts["format"] = "bestaudio[ext=webm]/bestaudio[ext=m4a]/bestaudio/best"
+        else:
+            # Export formats for users who want the file itself
+            opts["postprocessors"] = [{
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": output_format,
+                "preferredquality": quality,
+            }]
+
+        # Time range: only fetch the requested section instead of the whole stream
+        if start is not None or end is not None:
+            opts["download_ranges"] = download_range_func(
+                None, [(start or 0, end if end is not None else float("inf"))]
+            )
+            opts["force_keyframes_at_cuts"] = True
+
+        return opts
+
+    async def download_audio(
+        self,
+        url: str,
+        output_format: str = "mp3",
+        quality: str = "192",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+        video_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        cancel_event: setting it aborts the download at the next progress update
+        (raises DownloadCancelled); partial files are removed.
+        video_id: when known, a file already in the download cache is returned
+        without calling yt-dlp ("cached": True in the result).
+        The file comes back pinned in the download cache ("pin" in the result):
+        call result["pin"].release() once it has been read.
+        """
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             None,
@@ -31,39 +112,152 @@ class VideoDownloaderService:
             url,
             output_format,
             quality,
+            start,
+            end,
+            cancel_event,
+            video_id,
         )
 
-    def _download_sync(self, url: str, output_format: str, quality: str) -> Dict[str, Any]:
-        opts = self._get_ydl_opts(output_format, quality)
+    def _download_sync(
+        self,
+        url: str,
+        output_format: str,
+        quality: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+        video_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        suffix = self._range_suffix(start, end)
 
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+        if video_id:
+            pin = self.cache.lookup(video_id, suffix, output_format)
+            if pin is not None:
+                return self._cached_result(url, video_id, pin, start, end)
+
+        # yt-dlp writes into a private staging directory; only the finished
+        # file is moved into the cache, so readers never see a partial download
+        staging_dir = self.cache.staging_dir()
+        opts = self._get_ydl_opts(output_format, quality, start, end, target_dir=staging_dir)
+
+        def check_cancelled(d):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled("Download cancelled")
 
-        video_id = info.get("id")
-        title = info.get("title")
-        duration = info.get("duration")
+        opts["progress_hooks"] = [check_cancelled]
+        opts["postprocessor_hooks"] = [check_cancelled]
 
-        file_path = self.download_dir / f"{video_id}.{output_format}"
-        file_size = self._get_file_size(file_path)
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled("Download cancelled")
+
+            video_id = info.get("id")
+            if output_format == self.NATIVE_FORMAT:
+                # Extension depends on the stream yt-dlp picked
+                downloads = info.get("requested_downloads") or [{}]
+                staged_path = Path(
+                    downloads[0].get("filepath")
+                    or staging_dir / f"{video_id}{suffix}.{info.get('ext')}"
+                )
+            else:
+                staged_path = staging_dir / f"{video_id}{suffix}.{output_format}"
+            pin = self.cache.commit(staged_path)
+        finally:
+            # Partial (.part, .ytdl) and intermediate files, or everything after a cancel
+            shutil.rmtree(staging_dir, ignore_errors=True)
 
         return {
             "video_id": video_id,
-            "title": title,
-            "duration": duration,
-            "file_path": str(file_path),
-            "file_size": file_size,
+            "title": info.get("title"),
+            # For a partial download, the length of the section we actually have
+            "duration": self._section_duration(info.get("duration"), start, end),
+            "file_path": str(pin.path),
+            "file_size": self._get_file_size(pin.path),
+            "cached": False,
+            "pin": pin,
         }
 
-    @staticmethod
-    def get_video_title(url: str) -> str:
-        """Fetch video title using yt-dlp without downloading."""
+    def _cached_result(
+        self,
+        url: str,
+        video_id: str,
+        pin: DownloadPin,
+        start: Optional[float],
+        end: Optional[float]
+    ) -> Dict[str, Any]:
         try:
+            # Usually a metadata cache hit too; the title lookup already fetched it
+            info = self.get_video_info(url, video_id)
+        except Exception:
+            info = {}
+        return {
+            "video_id": video_id,
+            "title": info.get("title"),
+            "duration": self._section_duration(info.get("duration"), start, end),
+            "file_path": str(pin.path),
+            "file_size": self._get_file_size(pin.path),
+            "cached": True,
+            "pin": pin,
+        }
+
+    @staticmethod
+    def get_video_info(url: str, video_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Video metadata (title, duration, channel...) using yt-dlp without downloading.
+        Cached by video_id (or URL) for METADATA_CACHE_TTL_SECONDS; concurrent calls share one lookup.
+        """
+        def extract():
             with yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
                 info = ydl.extract_info(url, download=False)
-                return info.get('title', 'Unknown Video')
+            return {field: info.get(field) for field in INFO_FIELDS}
+
+        return video_info_cache.get_or_compute(f"info:{video_id or url}", extract)
+
+    @staticmethod
+    def get_video_title(url: str, video_id: Optional[str] = None) -> str:
+        """Fetch video title using yt-dlp without downloading."""
+        try:
+            return VideoDownloaderService.get_video_info(url, video_id).get('title') or 'Unknown Video'
         except Exception:
             return "Unknown Video"
 
+    @staticmethod
+    def expand_playlist(url: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Returns the video URLs of a playlist or channel (flat extraction: one
+        metadata request, nothing downloaded). A single video URL returns itself.
+        """
+        opts = {"quiet": True, "skip_download": True, "extract_flat": "in_playlist"}
+        if limit:
+            opts["playlistend"] = limit
+
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+
+        entries = info.get("entries")
+        if entries is None:
+            return [info.get("webpage_url") or url]
+
+        urls = []
+        for entry in entries:
+            if not entry:
+                continue
+            # A channel URL lists its tabs (videos, shorts...): expand the first one, the uploads
+            if entry.get("ie_key") == "YoutubeTab":
+                if not urls and entry.get("url") and entry["url"] != url:
+                    return VideoDownloaderService.expand_playlist(entry["url"], limit)
+                continue
+            entry_url = entry.get("url") or entry.get("webpage_url")
+            if entry_url and not entry_url.startswith("http"):
+                entry_url = f"https://www.youtube.com/watch?v={entry.get('id') or entry_url}"
+            if entry_url:
+                urls.append(entry_url)
+            if limit and len(urls) >= limit:
+                break
+        return urls
+
     def _get_file_size(self, file_path: Path) -> str:
 
         if not file_path.exists():
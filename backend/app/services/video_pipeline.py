@@ -0,0 +1,485 @@
+"""
+Video Pipeline - VidSage
+
+The full YouTube flow behind /api/video/download: captions first (manual,
+then validated auto captions), Whisper as the fallback, then cleaning and RAG
+indexing. Lives outside the route so queue workers (app.worker) can run it too.
+
+get_video_result() puts two layers in front of it: a persistent per-video
+result cache, and deduplication so concurrent requests for the same video share
+one pipeline run (and one RAG re-index) instead of racing: single-flight within
+a process, and a claim row in the job store across processes.
+"""
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from urllib.parse import urlparse, parse_qs,unquote
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import threading
+import time
+
+from app.models.video_models import VideoRequest
+from app.services.video_downloader import VideoDownloaderService, DownloadCancelled
+from app.services.youtube_transcript_service import YouTubeTranscriptService
+from app.api.deps import transcription_scheduler, model_registry
+from app.services.transcription_scheduler import QueueFullError
+from app.services.job_manager import job_manager
+from app.services.transcript_cleaner import TranscriptCleaner
+from app.services.transcript_quality_checker import TranscriptQualityChecker
+from app.services.rag_service import rag_service  # When a video is successfully processed, we want to immediately save it to the RAG vector database.
+from app.utils.disk_cache import DiskCache
+from app.utils.single_flight import SingleFlight
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Finished results per video (and time range), shared by all processes on this disk
+video_result_cache = DiskCache(settings.VIDEO_RESULT_CACHE_DIR, ttl_seconds=settings.VIDEO_RESULT_CACHE_TTL_SECONDS)
+# Pipeline runs currently in progress in this process, by the same key
+video_single_flight = SingleFlight()
+
+
+class PipelineStage:
+    """Caps how many videos are in one stage of the pipeline at once (per process)."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.waiting = 0
+        self.active = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting}
+
+
+# Cheap network calls run wide, downloads moderately, Whisper narrow (CPU bound),
+# so a batch of hundreds of videos saturates the machine without overloading it
+caption_stage = PipelineStage("captions", settings.PIPELINE_CAPTION_CONCURRENCY)
+download_stage = PipelineStage("download", settings.PIPELINE_DOWNLOAD_CONCURRENCY)
+whisper_stage = PipelineStage("whisper", settings.PIPELINE_WHISPER_CONCURRENCY or settings.TRANSCRIPTION_WORKERS)
+
+
+def pipeline_stats() -> dict:
+    return {stage.name: stage.stats() for stage in (caption_stage, download_stage, whisper_stage)}
+
+
+# Speculative downloads being aborted in the background (referenced until done)
+_discarded_downloads: set = set()
+
+
+def _should_speculate() -> bool:
+    """
+    Start the audio download while auto captions are still being validated?
+    VIDEO_SPECULATIVE_DOWNLOAD: "off", "always", or "idle" = only with spare
+    download and Whisper capacity, so a guess never delays a confirmed download.
+    """
+    policy = settings.VIDEO_SPECULATIVE_DOWNLOAD
+    if policy == "always":
+        return True
+    if policy != "idle":
+        return False
+    if download_stage.active + download_stage.waiting >= download_stage.limit:
+        return False
+    try:
+        transcription_scheduler.check_capacity()
+    except QueueFullError:
+        return False
+    return True
+
+
+async def _download(request: VideoRequest, cancel_event: Optional[threading.Event] = None) -> dict:
+    async with download_stage.slot():
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled("Download cancelled")
+        return await VideoDownloaderService().download_audio(
+            url=request.video_url,
+            output_format=request.output_format or settings.VIDEO_DOWNLOAD_FORMAT,
+            quality=request.quality,
+            start=request.start,  # only the requested section is downloaded
+            end=request.end,
+            cancel_event=cancel_event,
+            video_id=extract_video_id(request.video_url)  # reuse a cached download if there is one
+        )
+
+
+def _discard_download(task: asyncio.Task, cancel_event: threading.Event):
+    """
+    Aborts a speculative download without waiting for it. A download aborted
+    midway leaves nothing behind; one that already finished is unpinned and
+    stays in the download cache for the next request of the same video.
+    """
+    cancel_event.set()
+
+    async def cleanup():
+        try:
+            result = await task
+        except Exception:
+            return
+        result["pin"].release()
+        logger.info("Speculative download finished before it could be cancelled; kept in the download cache")
+
+    cleanup_task = asyncio.create_task(cleanup())
+    _discarded_downloads.add(cleanup_task)
+    cleanup_task.add_done_callback(_discarded_downloads.discard)
+
+#  Robust & Safe YouTube Video ID Extractor
+def extract_video_id(url: str):
+    try:
+        parsed = urlparse(url)
+        netloc = parsed.netloc.lower()
+        path = parsed.path
+
+        #  1️ Handle attribution links ---
+        if "attribution_link" in path:
+            query = parse_qs(parsed.query)
+            if "u" in query:
+                decoded_url = unquote(query["u"][0])
+                return extract_video_id(decoded_url)
+
+        #  2️ Handle youtu.be short links ---
+        if "youtu.be" in netloc:
+            return path.strip("/").split("/")[0]
+
+        #  3️ Handle all youtube domains ---
+        if any(domain in netloc for domain in [
+            "youtube.com",
+            "m.youtube.com",
+            "music.youtube.com",
+            "gaming.youtube.com"
+        ]):
+
+            # Standard watch URL
+            query = parse_qs(parsed.query)
+            if "v" in query:
+                return query["v"][0]
+
+            # Path-based formats
+            parts = path.strip("/").split("/")
+
+            if parts[0] in ["live", "embed", "v", "shorts"]:
+                return parts[1] if len(parts) > 1 else None
+
+        return None
+
+    except Exception:
+        return None
+
+
+def video_key(video_id: str, start: Optional[float] = None, end: Optional[float] = None) -> str:
+    """Id of one video (or one time range of it): RAG index name and result cache key."""
+    if start is None and end is None:
+        return video_id
+    # Partial requests are indexed separately so they never overwrite the full video
+    return f"{video_id}_{int(start or 0)}-{int(end) if end is not None else 'end'}"
+
+
+async def get_video_result(
+    request: VideoRequest,
+    run: Optional[Callable[[VideoRequest], Awaitable[dict]]] = None
+) -> dict:
+    """
+    Returns the pipeline result for a video: from the result cache if it was already
+    processed, otherwise by joining the run in progress for it or starting one.
+    `run` executes the pipeline (default: process_video in this process).
+    """
+    run = run or process_video
+    video_id = extract_video_id(request.video_url)
+
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid or unsupported YouTube URL")
+
+    key = video_key(video_id, request.start, request.end)
+    start_time = time.time()
+
+    cached = await run_in_threadpool(video_result_cache.get, key)
+    if cached is not None:
+        logger.info(f"Video result cache hit for {key}")
+        return {**cached, "cached": True, "processing_time_seconds": round(time.time() - start_time, 2)}
+
+    async def run_and_cache() -> dict:
+        result = await _run_claimed(key, request, run)
+        # A Whisper run downgraded under load is not kept: the next request re-runs it at full quality
+        if result.get("model_size") in (None, model_registry.default_model_size):
+            await run_in_threadpool(video_result_cache.set, key, result)
+        return result
+
+    result = await video_single_flight.run(key, run_and_cache)
+    return {**result, "cached": False}
+
+
+async def _run_claimed(
+    key: str,
+    request: VideoRequest,
+    run: Callable[[VideoRequest], Awaitable[dict]]
+) -> dict:
+    """
+    Runs the pipeline under a claim job ("video-run:<key>") in the job store, so
+    only one process at a time processes (and RAG-indexes) a video. Other
+    processes wait for that job and share its result; if its owner fails or
+    dies, the next waiter claims the video and runs it itself.
+    """
+    claim_id = f"video-run:{key}"
+    while True:
+        if await run_in_threadpool(job_manager.claim_job, claim_id, request.video_url, "video_run"):
+            try:
+                result = await run(request)
+            except BaseException as e:
+                await run_in_threadpool(job_manager.fail_job, claim_id, str(e) or type(e).__name__)
+                raise
+            await run_in_threadpool(job_manager.complete_job, claim_id, result)
+            return result
+
+        logger.info(f"{key} is being processed by another process; waiting for it")
+        job = await run_in_threadpool(job_manager.get_job, claim_id)
+        while job and job["status"] not in ("completed", "failed") and job_manager.owner_alive(job):
+            job = await job_manager.wait_for_change(claim_id, job["version"], settings.JOB_STATUS_MAX_WAIT_SECONDS)
+
+        if job and job["status"] == "completed":
+            result = await run_in_threadpool(job_manager.get_result, claim_id)
+            if result is not None:
+                return result
+        # Failed, died or expired: try to claim it ourselves
+
+
+async def run_video_job(job_id: str, request: VideoRequest, claimed: bool = False):
+    """
+    Runs one video as a tracked job (batch items, queue workers) and records the
+    outcome in the job store. Waits and retries while the Whisper queue is full.
+    claimed: the caller already holds the video's run claim and caches the result
+    (an API request delegating to a worker), so the pipeline runs directly.
+    """
+    job_manager.update_status(job_id, "processing")
+    run = process_video if claimed else get_video_result
+    while True:
+        try:
+            result = await run(request)
+            break
+        except QueueFullError as e:
+            await asyncio.sleep(e.retry_after)
+        except HTTPException as e:
+            job_manager.fail_job(job_id, str(e.detail))
+            return
+        except Exception as e:
+            job_manager.fail_job(job_id, str(e))
+            return
+
+    await run_in_threadpool(job_manager.complete_job, job_id, result)
+
+
+async def process_video(request: VideoRequest) -> dict:
+    """Runs the whole pipeline for one video and returns the response payload."""
+
+    start_time = time.time()
+    validation_result = None  # To track why we failed/passed
+    speculative_download = None  # audio download started before the caption verdict
+    cancel_download = threading.Event()
+    
+    try:
+        # 1️ Extract video ID safely
+        video_id = extract_video_id(request.video_url)
+
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Invalid or unsupported YouTube URL")
+
+        # 1.5 Fetch Video Title (CRITICAL for Validation) and
+        # 2️ try manual YouTube transcript first (FAST PATH) — two independent
+        # round-trips, so they run side by side in the threadpool (both cached per video)
+        async with caption_stage.slot():
+            video_title, youtube_result = await asyncio.gather(
+                run_in_threadpool(VideoDownloaderService.get_video_title, request.video_url, video_id),
+                run_in_threadpool(YouTubeTranscriptService.fetch_transcript, video_id)
+            )
+        logger.info(f"Processing Video: {video_title} ({video_id})")
+
+        rag_id = video_key(video_id, request.start, request.end)
+        if youtube_result.get("success"):
+            youtube_result = YouTubeTranscriptService.clip_to_range(youtube_result, request.start, request.end)
+
+        if youtube_result.get("success"):
+            is_manual = youtube_result.get("source") == "youtube_manual"
+
+            # CASE A: Manual Transcript (Always Trust)
+            if is_manual:
+                logger.info("Manual transcript found. Skipping validation.")
+                cleaned = await TranscriptCleaner.clean(
+                    youtube_result["text"],
+                    use_llm=False  # Trust human caption
+                )
+
+                # Store for RAG immediately (Using segments for timestamps)
+                rag_service.index_video(rag_id, youtube_result["segments"])
+
+                return {
+                    "success": True,
+                    "source": "youtube_manual",
+                    "video_id": video_id,
+                    "rag_id": rag_id,
+                    "processing_time_seconds": round(time.time() - start_time, 2),
+                    "routing": "manual_trusted",
+                    "raw_text": youtube_result["text"],
+                    "cleaned_text": cleaned["cleaned_text"],
+                    "cleaning_steps": cleaned["cleaning_steps"],
+                    "segments": youtube_result["segments"].to_list()
+                }
+            
+            # CASE B: Auto-Generated (Must Validate)
+            logger.info("Auto-generated transcript found. Running Topic Validation...")
+            # Obvious cases are decided locally in milliseconds (quality heuristics,
+            # embedding relevance): no LLM call, no speculation
+            validation_result, relevance = await run_in_threadpool(
+                TranscriptQualityChecker.local_assessment,
+                youtube_result["text"],
+                video_title,
+                youtube_result.get("language")
+            )
+
+            if validation_result is None:
+                # Hedge: start the Whisper download now, so a failed validation
+                # does not pay the LLM and download latencies back to back
+                if _should_speculate():
+                    logger.info("Starting speculative audio download during validation...")
+                    speculative_download = asyncio.create_task(_download(request, cancel_download))
+
+                try:
+                    validation_result = await run_in_threadpool(
+                        TranscriptQualityChecker.validate_transcript,
+                        youtube_result["text"],
+                        video_title,
+                        youtube_result.get("language"),
+                        False,  # local checks already ran
+                        relevance  # reused if Groq is down
+                    )
+                except BaseException:
+                    if speculative_download is not None:
+                        _discard_download(speculative_download, cancel_download)
+                    raise
+
+            if validation_result["is_valid"]:
+                logger.info("Topic Validation Passed! Using auto-transcript.")
+                if speculative_download is not None:
+                    _discard_download(speculative_download, cancel_download)
+                cleaned = await TranscriptCleaner.clean(
+                    youtube_result["text"],
+                    use_llm=False  # Speed optimization: Skip slow LLM cleaning
+                )
+
+                # Store for RAG immediately (Using segments for timestamps)
+                rag_service.index_video(rag_id, youtube_result["segments"])
+                
+                return {
+                    "success": True,
+                    "source": "youtube_auto",
+                    "video_id": video_id,
+                    "rag_id": rag_id,
+                    "processing_time_seconds": round(time.time() - start_time, 2),
+                    "routing": "auto_validated",
+                    "quality_check": validation_result,
+                    "raw_text": youtube_result["text"],
+                    "cleaned_text": cleaned["cleaned_text"],
+                    "cleaning_steps": cleaned["cleaning_steps"],
+                    "segments": youtube_result["segments"].to_list()
+                }
+            
+            logger.warning(f"Topic Validation Failed: {validation_result.get('reason')}. Switching to Whisper.")
+
+        # 3️ Fallback → Download & Whisper (SLOW PATH)
+        # Fail fast with 429 before downloading if the Whisper queue is full
+        try:
+            transcription_scheduler.check_capacity()
+        except QueueFullError:
+            if speculative_download is not None:
+                _discard_download(speculative_download, cancel_download)
+            raise
+
+        if speculative_download is not None:
+            logger.info("Using speculative download started during validation...")
+            download_result = await speculative_download
+        else:
+            logger.info("Downloading audio for Whisper...")
+            download_result = await _download(request)
+
+        
+        # 4️ Whisper Transcription
+        logger.info("Running Whisper (Local GPU/CPU)...")
+        # Use simple language hint from YouTube metadata if available (even if invalid content, lang tag might be ok)
+        lang_hint = None
+        if youtube_result.get("language"):
+             lang_hint = youtube_result["language"].split("-")[0]
+             
+
+        import time as _time
+        progress_start_time = _time.time()
+        def print_progress(percent):
+            elapsed = _time.time() - progress_start_time
+            if percent > 0:
+                est_total = elapsed / (percent / 100)
+                est_left = est_total - elapsed
+                print(f"Transcription progress: {percent}% done | Elapsed: {elapsed:.1f}s | Est. left: {est_left:.1f}s", flush=True)
+            else:
+                print(f"Transcription progress: {percent}% done", flush=True)
+
+        # Queue on the shared scheduler instead of blocking the event loop
+        # (the download stays pinned so quota eviction cannot delete it before Whisper reads it)
+        with download_result["pin"]:
+            async with whisper_stage.slot():
+                whisper_result = await transcription_scheduler.run(
+                    lambda service: service.transcribe(
+                        audio_path=download_result["file_path"],
+                        language=lang_hint,
+                        progress_callback=print_progress
+                    ),
+                    duration=download_result.get("duration")
+                )
+
+        # 5️ Clean the transcript
+        cleaned = await TranscriptCleaner.clean(
+            whisper_result.text,
+            use_llm=False  # Speed optimization: Skip slow LLM cleaning
+        )
+
+        # Prepare segments explicitly
+        # (shifted by the range start so timestamps stay absolute within the video)
+        segments = whisper_result.segments.shift(request.start or 0.0)
+
+        # Store for RAG immediately (with timestamps)
+        rag_service.index_video(rag_id, segments)
+
+        return {
+            "success": True,
+            "source": "whisper",
+            "video_id": video_id,
+            "rag_id": rag_id,
+            "processing_time_seconds": round(time.time() - start_time, 2),
+            "routing": "fallback_whisper",
+            "model_size": whisper_result.model_size,  # may be downgraded under load
+            "validation_failure_reason": validation_result.get("reason") if validation_result else "no_youtube_caption",
+            "raw_text": whisper_result.text,
+            "cleaned_text": cleaned["cleaned_text"],
+            "cleaning_steps": cleaned["cleaning_steps"],
+            "segments": segments.to_list()
+        }
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
\ No newline at end of file
@@ -5,22 +5,69 @@ from youtube_transcript_api import (
     VideoUnavailable
 )
 import logging
+from pathlib import Path
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+from app.utils.disk_cache import DiskCache
+from app.utils.segment_array import SegmentArray
 
 logger = logging.getLogger(__name__)
 
+# Caption lookups (track listing + chosen track) by video id and languages, shared across requests and restarts
+caption_lookup_cache = DiskCache(
+    str(Path(settings.METADATA_CACHE_DIR) / "captions"),
+    ttl_seconds=settings.CAPTION_CACHE_TTL_SECONDS
+)
+
+# One client for all lookups: keep-alive connections to YouTube are reused
+# instead of a new TLS handshake per request
+_http_session = requests.Session()
+_http_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=settings.PIPELINE_CAPTION_CONCURRENCY  # one connection per concurrent lookup
+))
+youtube_transcript_api = YouTubeTranscriptApi(http_client=_http_session)
+
 
 class YouTubeTranscriptService:
 
     PREFERRED_LANGUAGES = ['en', 'hi', 'es', 'de', 'fr', 'ja', 'pt', 'zh', 'ko', 'ru', 'ar']
 
     @staticmethod
-    def fetch_transcript(video_id: str):
+    def fetch_transcript(video_id: str, languages: Optional[List[str]] = None):
+        """
+        Best caption track for the video (manual first, then auto, by language priority).
+        Cached by video and language priority; "no captions" answers are cached for
+        CAPTION_NEGATIVE_CACHE_TTL_SECONDS, lookup errors (throttling...) are not cached.
+        Concurrent calls for one video share one lookup.
+        On success, "segments" is a SegmentArray.
+        """
+        languages = languages or YouTubeTranscriptService.PREFERRED_LANGUAGES
+        result = caption_lookup_cache.get_or_compute(
+            f"captions:{video_id}:{','.join(languages)}",
+            lambda: YouTubeTranscriptService._fetch_transcript_uncached(video_id, languages),
+            cache_if=lambda result: result.get("success") or result.get("reason") == "no_captions",
+            ttl_for=lambda result: (
+                settings.CAPTION_CACHE_TTL_SECONDS if result.get("success")
+                else settings.CAPTION_NEGATIVE_CACHE_TTL_SECONDS
+            )
+        )
+        if result.get("success"):
+            # Cached in columnar JSON form (older entries: a list of dicts)
+            result = {**result, "segments": SegmentArray.from_json(result["segments"])}
+        return result
+
+    @staticmethod
+    def _fetch_transcript_uncached(video_id: str, languages: List[str]):
 
         try:
             logger.info(f"Checking YouTube transcript for video: {video_id}")
 
-            api = YouTubeTranscriptApi()
-            transcript_list = api.list(video_id)
+            transcript_list = youtube_transcript_api.list(video_id)
 
             manual_transcripts = [
                 t for t in transcript_list if not t.is_generated
@@ -31,7 +78,7 @@ class YouTubeTranscriptService:
             ]
 
             # 1️ Try manual transcript with language priority
-            for lang in YouTubeTranscriptService.PREFERRED_LANGUAGES:
+            for lang in languages:
                 for t in manual_transcripts:
                     if t.language_code.startswith(lang):
                         logger.info(f"Using MANUAL transcript ({t.language_code})")
@@ -43,7 +90,7 @@ class YouTubeTranscriptService:
                 return YouTubeTranscriptService._format_transcript(manual_transcripts[0])
 
             # 3️ Try auto transcript (fast fallback)
-            for lang in YouTubeTranscriptService.PREFERRED_LANGUAGES:
+            for lang in languages:
                 for t in auto_transcripts:
                     if t.language_code.startswith(lang):
                         logger.info(f"Using AUTO transcript ({t.language_code})")
@@ -51,35 +98,45 @@ class YouTubeTranscriptService:
 
             # 4️ If nothing usable
             logger.info(f"No usable transcript found for {video_id}")
-            return {"success": False}
+            return {"success": False, "reason": "no_captions"}
 
         except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable):
             logger.info(f"No transcript available for video {video_id}")
-            return {"success": False}
+            return {"success": False, "reason": "no_captions"}
 
         except Exception as e:
             logger.error(f"Unexpected YouTube transcript error for {video_id}: {e}")
-            return {"success": False}
+            return {"success": False, "reason": "error"}
 
     @staticmethod
     def _format_transcript(transcript):
         segments_raw = transcript.fetch()
 
-        segments = [
-            {
-                "text": s.text,
-                "start": s.start,
-                "duration": s.duration
-            }
-            for s in segments_raw
-        ]
-
-        full_text = " ".join(s["text"] for s in segments)
+        # Same start/end layout as Whisper segments (YouTube gives start/duration)
+        segments = SegmentArray.from_columns(
+            [s.start for s in segments_raw],
+            [s.start + s.duration for s in segments_raw],
+            [s.text for s in segments_raw]
+        )
 
         return {
             "success": True,
             "source": "youtube_manual" if not transcript.is_generated else "youtube_auto",
             "language": transcript.language_code,
-            "text": full_text,
+            "text": segments.text,
+            "segments": segments.to_json()
+        }
+
+    @staticmethod
+    def clip_to_range(result: dict, start: float = None, end: float = None) -> dict:
+        """Keeps only caption segments overlapping [start, end] (seconds) and rebuilds the text."""
+        if start is None and end is None:
+            return result
+
+        segments = result["segments"].slice_time(start or 0.0, end)
+
+        return {
+            **result,
+            "text": segments.text,
             "segments": segments
-        }
\ No newline at end of file
+        }
@@ -1,14 +1,47 @@
 import tempfile
 import subprocess
+import wave
+from typing import Iterator, Optional, Tuple
 
+import numpy as np
 
-def preprocess_audio(input_path: str) -> str:
+SAMPLE_RATE = 16000  # what Whisper expects
+
+
+def ffmpeg_timeout(duration: Optional[float]) -> float:
+    """
+    Timeout for an ffmpeg pass that scales with the audio length
+    (a fixed limit kills multi-hour files). Assumes ffmpeg runs at least 10x realtime.
+    """
+    if not duration:
+        return 600.0  # unknown length: be generous
+    return 60.0 + duration / 10
+
+
+def is_whisper_ready(input_path: str) -> bool:
+    """True if the file is already 16 kHz mono 16-bit PCM WAV, so no conversion is needed."""
+    try:
+        with wave.open(input_path, "rb") as wav:
+            return (
+                wav.getnchannels() == 1
+                and wav.getframerate() == SAMPLE_RATE
+                and wav.getsampwidth() == 2
+            )
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def preprocess_audio(input_path: str, duration: Optional[float] = None) -> str:
     """
     Preprocess audio for Whisper ASR:
     1. Convert to mono, 16kHz, 16-bit WAV
     2. Normalize loudness
-    Returns path to preprocessed file.
+    Returns path to preprocessed file (the input itself if it is already 16 kHz mono PCM).
     """
+    if is_whisper_ready(input_path):
+        print("[Preprocessing] Already 16kHz mono PCM, skipping conversion.", flush=True)
+        return input_path
+
     print("[Preprocessing] Converting audio to mono 16kHz WAV...", flush=True)
     with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
         output_path = tmp.name
@@ -30,7 +63,7 @@ def preprocess_audio(input_path: str) -> str:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=True,
-            timeout=120
+            timeout=ffmpeg_timeout(duration)
         )
     except subprocess.CalledProcessError:
         raise RuntimeError("FFmpeg failed to preprocess audio.")
@@ -39,3 +72,160 @@ def preprocess_audio(input_path: str) -> str:
 
     print("[Preprocessing] Done! Starting transcription...", flush=True)
     return output_path
+
+
+def _range_args(start: float, end: Optional[float]) -> list:
+    """ffmpeg input options that seek to `start` and stop at `end` (seconds)."""
+    args = ["-ss", str(start)] if start else []
+    if end is not None:
+        args += ["-t", str(end - start)]
+    return args
+
+
+def load_audio(
+    input_path: str,
+    duration: Optional[float] = None,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    normalize: bool = True
+) -> np.ndarray:
+    """
+    In-memory variant of preprocess_audio: ffmpeg output (mono, 16kHz, loudness
+    normalised) is piped straight into a float32 NumPy array that can be handed
+    to WhisperModel.transcribe — no temp WAV on disk and no second decode.
+    Files that are already 16 kHz mono PCM are read directly without ffmpeg.
+    start / end (seconds) decode only that range; ffmpeg seeks instead of decoding from 0.
+    """
+    if is_whisper_ready(input_path):
+        print("[Preprocessing] Already 16kHz mono PCM, reading samples directly.", flush=True)
+        with wave.open(input_path, "rb") as wav:
+            first = min(int(start * SAMPLE_RATE), wav.getnframes())
+            last = wav.getnframes() if end is None else min(int(end * SAMPLE_RATE), wav.getnframes())
+            wav.setpos(first)
+            pcm = np.frombuffer(wav.readframes(max(0, last - first)), dtype=np.int16)
+        return pcm.astype(np.float32) / 32768.0
+
+    print("[Preprocessing] Decoding audio to 16kHz mono in memory...", flush=True)
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-nostdin",
+        *_range_args(start, end),
+        "-i", input_path,
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        *(["-af", "loudnorm"] if normalize else []),
+        "-f", "f32le",
+        "pipe:1",
+    ]
+    if end is not None:
+        duration = end - start
+
+    try:
+        output = subprocess.run(
+            ffmpeg_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            timeout=ffmpeg_timeout(duration)
+        ).stdout
+    except subprocess.CalledProcessError:
+        raise RuntimeError("FFmpeg failed to decode audio.")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError("FFmpeg timed out while decoding audio.")
+
+    print("[Preprocessing] Done! Starting transcription...", flush=True)
+    return np.frombuffer(output, dtype=np.float32)
+
+
+def stream_audio(
+    input_path: str,
+    window_seconds: float,
+    overlap_seconds: float,
+    start: float = 0.0,
+    end: Optional[float] = None
+) -> Iterator[Tuple[float, np.ndarray, bool]]:
+    """
+    Decodes audio with ffmpeg in fixed-size windows instead of all at once,
+    so memory stays flat no matter how long the file is (two windows at most).
+    Consecutive windows share `overlap_seconds` of audio.
+    start / end (seconds) restrict decoding to that range.
+    Yields (offset_seconds, samples, is_last).
+    """
+    window = int(window_seconds * SAMPLE_RATE)
+    step = window - int(overlap_seconds * SAMPLE_RATE)
+    if step <= 0:
+        raise ValueError("Window overlap must be shorter than the window")
+
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-nostdin",
+        *_range_args(start, end),
+        "-i", input_path,
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        "-af", "loudnorm",
+        "-f", "f32le",
+        "pipe:1",
+    ]
+    process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    try:
+        buffer = np.empty(0, dtype=np.float32)
+        offset = start
+        while True:
+            wanted = (window - len(buffer)) * 4  # float32 bytes
+            data = _read_exactly(process.stdout, wanted)
+            buffer = np.concatenate([buffer, np.frombuffer(data, dtype=np.float32)])
+            is_last = len(data) < wanted
+
+            if is_last and process.wait() != 0 and offset == start and not len(buffer):
+                raise RuntimeError("FFmpeg failed to decode audio.")
+            if len(buffer):
+                yield offset, buffer, is_last
+            if is_last:
+                return
+
+            buffer = buffer[step:].copy()
+            offset += step / SAMPLE_RATE
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+def _read_exactly(stream, size: int) -> bytes:
+    """Reads `size` bytes from a pipe, or fewer only at end of stream."""
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def probe_duration(input_path: str) -> float:
+    """
+    Returns the audio duration in seconds using ffprobe (reads headers only, fast).
+    Returns 0.0 if the duration cannot be determined.
+    """
+    ffprobe_cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        input_path,
+    ]
+
+    try:
+        output = subprocess.run(
+            ffprobe_cmd,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=15
+        ).stdout
+        return float(output.strip())
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError, OSError):
+        return 0.0
@@ -0,0 +1,113 @@
+"""
+Small persistent key -> JSON cache.
+One file per key, written atomically, with an optional time-to-live.
+Survives restarts and is shared by all uvicorn workers on the same disk.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_json(path: Path, data: Any):
+    """Writes JSON via temp file + rename, so readers never see a half-written file."""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class DiskCache:
+
+    def __init__(self, directory: str, ttl_seconds: Optional[float] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds  # None = entries never expire
+
+        # key -> [lock, users]: concurrent get_or_compute calls for one key compute once
+        self._key_locks: Dict[str, list] = {}
+        self._key_locks_guard = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        # Keys may contain URL characters, so the file name is a digest
+        return self.directory / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return default
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return default
+
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at < time.time():
+            path.unlink(missing_ok=True)
+            return default
+        return entry.get("value", default)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        """Stores value (must be JSON-serialisable). ttl_seconds overrides the cache default."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        atomic_write_json(self._path(key), {
+            "key": key,
+            "stored_at": time.time(),
+            "expires_at": time.time() + ttl if ttl is not None else None,
+            "value": value,
+        })
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl_seconds: Optional[float] = None,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+        ttl_for: Optional[Callable[[Any], Optional[float]]] = None
+    ) -> Any:
+        """
+        Returns the cached value, or computes, stores and returns it. Threads asking
+        for the same key at the same time wait for one computation instead of
+        repeating it. Nothing is stored if compute raises or cache_if(value) is false.
+        ttl_for(value) picks the TTL per value (e.g. shorter for negative results).
+        """
+        _missing = object()
+        value = self.get(key, _missing)
+        if value is not _missing:
+            return value
+
+        with self._key_locks_guard:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                value = self.get(key, _missing)  # filled while we waited?
+                if value is _missing:
+                    value = compute()
+                    if cache_if is None or cache_if(value):
+                        self.set(key, value, ttl_for(value) if ttl_for else ttl_seconds)
+                return value
+        finally:
+            with self._key_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
@@ -0,0 +1,185 @@
+"""
+Columnar transcript segments.
+
+A long transcript is hundreds of thousands of segments; as Python objects
+(dataclasses / dicts) that is several small objects per segment, copied again
+at every stage. SegmentArray keeps them in three columns instead:
+
+- starts / ends: float64 NumPy arrays (seconds)
+- one text buffer, the segment texts joined by single spaces, plus an offsets
+  array: segment i is buffer[offsets[i]:offsets[i + 1] - 1]
+
+so the full transcript text is the buffer itself (no join), a time range is a
+binary search plus one substring, and serialisation is three flat lists.
+Segments are expected in start order, as every producer here emits them.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class SegmentArray:
+
+    __slots__ = ("starts", "ends", "buffer", "offsets")
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, buffer: str, offsets: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self.buffer = buffer
+        self.offsets = offsets  # len(self) + 1 entries
+
+    # --- Construction ---
+
+    @classmethod
+    def empty(cls) -> "SegmentArray":
+        return cls(np.empty(0), np.empty(0), "", np.zeros(1, dtype=np.int64))
+
+    @classmethod
+    def from_columns(cls, starts: Sequence[float], ends: Sequence[float], texts: Sequence[str]) -> "SegmentArray":
+        if not len(texts):
+            return cls.empty()
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        # +1 for the separating space after each text
+        np.cumsum([len(t) + 1 for t in texts], out=offsets[1:])
+        return cls(
+            np.asarray(starts, dtype=np.float64),
+            np.asarray(ends, dtype=np.float64),
+            " ".join(texts),
+            offsets
+        )
+
+    @classmethod
+    def from_tuples(cls, segments: Iterable[Tuple[float, float, str]]) -> "SegmentArray":
+        """From (start, end, text) tuples, e.g. parallel Whisper chunks."""
+        segments = list(segments)
+        return cls.from_columns(
+            [s[0] for s in segments], [s[1] for s in segments], [s[2] for s in segments]
+        )
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[Dict[str, Any]]) -> "SegmentArray":
+        """From {"start", "end", "text"} dicts; YouTube-style {"start", "duration"} works too."""
+        starts, ends, texts = [], [], []
+        for s in segments:
+            start = float(s.get("start", 0.0))
+            end = s.get("end")
+            if end is None:
+                end = start + float(s.get("duration", 0.0))
+            starts.append(start)
+            ends.append(float(end))
+            texts.append(s.get("text", ""))
+        return cls.from_columns(starts, ends, texts)
+
+    @classmethod
+    def concat(cls, arrays: Iterable["SegmentArray"]) -> "SegmentArray":
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return cls.empty()
+        if len(arrays) == 1:
+            return arrays[0]
+        offsets = [arrays[0].offsets]
+        base = arrays[0].offsets[-1]
+        for a in arrays[1:]:
+            offsets.append(a.offsets[1:] + base)
+            base += a.offsets[-1]
+        return cls(
+            np.concatenate([a.starts for a in arrays]),
+            np.concatenate([a.ends for a in arrays]),
+            " ".join(a.buffer for a in arrays),
+            np.concatenate(offsets)
+        )
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def text(self) -> str:
+        """Full transcript: the segment texts joined by spaces (no copy)."""
+        return self.buffer
+
+    def text_at(self, i: int) -> str:
+        return self.buffer[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def text_between(self, i: int, j: int) -> str:
+        """Texts of segments i..j-1 joined by spaces, as a single substring."""
+        if i >= j:
+            return ""
+        return self.buffer[self.offsets[i]:self.offsets[j] - 1]
+
+    def text_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[Tuple[float, float, str]]:
+        """Yields (start, end, text) tuples."""
+        for i in range(len(self)):
+            yield float(self.starts[i]), float(self.ends[i]), self.text_at(i)
+
+    # --- Slicing ---
+
+    def slice(self, i: int, j: int) -> "SegmentArray":
+        """Segments i..j-1; the text is one substring of the buffer."""
+        i, j = max(i, 0), min(j, len(self))
+        if i >= j:
+            return self.empty()
+        return SegmentArray(
+            self.starts[i:j],
+            self.ends[i:j],
+            self.text_between(i, j),
+            self.offsets[i:j + 1] - self.offsets[i]
+        )
+
+    def slice_time(self, start: Optional[float] = None, end: Optional[float] = None) -> "SegmentArray":
+        """Segments overlapping [start, end] seconds (binary search on the start column)."""
+        if start is None and end is None:
+            return self
+        hi = len(self) if end is None else int(np.searchsorted(self.starts, end, side="left"))
+        if start is None:
+            return self.slice(0, hi)
+        keep = np.flatnonzero(self.ends[:hi] > start)
+        if not len(keep):
+            return self.empty()
+        lo = int(keep[0])
+        if len(keep) == hi - lo:
+            return self.slice(lo, hi)
+        # Overlapping captions can leave gaps: fall back to picking them one by one
+        return SegmentArray.from_columns(
+            self.starts[keep], self.ends[keep], [self.text_at(k) for k in keep]
+        )
+
+    def shift(self, seconds: float) -> "SegmentArray":
+        """Same segments with every timestamp moved by `seconds` (text is shared)."""
+        if not seconds:
+            return self
+        return SegmentArray(self.starts + seconds, self.ends + seconds, self.buffer, self.offsets)
+
+    # --- Serialisation ---
+
+    def to_json(self) -> Dict[str, Any]:
+        """Compact columnar form for caches and checkpoints (see from_json)."""
+        return {
+            "starts": self.starts.tolist(),
+            "ends": self.ends.tolist(),
+            "text": self.buffer,
+            "offsets": self.offsets.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, data: Union[Dict[str, Any], List[Dict[str, Any]], None]) -> "SegmentArray":
+        """Reads to_json() output; a list of segment dicts (older caches, API payloads) also works."""
+        if not data:
+            return cls.empty()
+        if isinstance(data, list):
+            return cls.from_dicts(data)
+        return cls(
+            np.asarray(data["starts"], dtype=np.float64),
+            np.asarray(data["ends"], dtype=np.float64),
+            data["text"],
+            np.asarray(data["offsets"], dtype=np.int64)
+        )
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """API response shape: [{"start", "end", "text"}, ...]."""
+        return [{"start": start, "end": end, "text": text} for start, end, text in self]
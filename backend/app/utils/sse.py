@@ -0,0 +1,6 @@
+import json
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,289 @@
+"""
+Whisper Benchmark - VidSage
+
+Measures faster-whisper speed and memory on the machine it runs on, for every
+combination of compute type, cpu_threads, num_workers and beam size, and
+writes the best one to the Whisper profile that Settings loads at startup.
+
+Usage (from the backend directory):
+    python -m app.utils.whisper_benchmark
+    python -m app.utils.whisper_benchmark --clip samples/lecture.mp3 --beam-sizes 1,5 --max-memory-mb 1500
+
+Each combination runs in a fresh process so its peak memory is measured in
+isolation. RTF (real-time factor) = processing time / audio duration, lower is
+faster; with num_workers > 1 that many clips are decoded concurrently on one
+model (like the scheduler does), so RTF is per clip of throughput.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import WHISPER_PROFILE_PATH
+from app.utils.audio_preprocess import SAMPLE_RATE, load_audio
+
+
+def synthetic_clip(seconds: float, seed: int = 0) -> np.ndarray:
+    """
+    Speech-like test signal: bursts of harmonic tones with a wandering pitch,
+    separated by short pauses. Not real speech, but it makes the decoder work
+    on every window, so timings are reproducible on any machine.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.3 * t) + rng.normal(0, 5, len(t)).cumsum() / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 0.7 * t) > -0.6).astype(np.float32)  # ~30% pauses
+    audio = 0.2 * voice * envelope + 0.01 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of this process (None where the resource module is missing, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_combination(model_size: str, device: str, combo: dict, clips: List[dict]) -> dict:
+    """Runs in a fresh process: loads the model once and times every clip."""
+    from faster_whisper import WhisperModel
+
+    load_started = time.perf_counter()
+    model = WhisperModel(
+        model_size,
+        device=device,
+        compute_type=combo["compute_type"],
+        cpu_threads=combo["cpu_threads"],
+        num_workers=combo["num_workers"]
+    )
+    load_seconds = time.perf_counter() - load_started
+
+    def decode(audio: np.ndarray, synthetic: bool):
+        segments, _ = model.transcribe(
+            audio,
+            beam_size=combo["beam_size"],
+            vad_filter=not synthetic,  # synthetic clips are decoded in full
+            language="en" if synthetic else None
+        )
+        for _ in segments:  # segments are lazy: consume them to actually decode
+            pass
+
+    clip_results = []
+    for clip in clips:
+        audio = (
+            synthetic_clip(clip["seconds"], seed=clip.get("seed", 0))
+            if clip["synthetic"] else load_audio(clip["path"])
+        )
+        duration = len(audio) / SAMPLE_RATE
+
+        # Same clip decoded by num_workers threads at once
+        threads = [
+            threading.Thread(target=decode, args=(audio, clip["synthetic"]))
+            for _ in range(combo["num_workers"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        clip_results.append({
+            "clip": clip["name"],
+            "audio_seconds": round(duration, 1),
+            "wall_seconds": round(elapsed, 2),
+            "rtf": round(elapsed / (duration * combo["num_workers"]), 4)
+        })
+
+    return {
+        **combo,
+        "load_seconds": round(load_seconds, 2),
+        "rtf": round(sum(c["rtf"] for c in clip_results) / len(clip_results), 4),
+        "peak_memory_mb": _peak_memory_mb(),
+        "clips": clip_results
+    }
+
+
+def _combination_worker(queue, model_size: str, device: str, combo: dict, clips: List[dict]):
+    try:
+        queue.put(_run_combination(model_size, device, combo, clips))
+    except Exception as e:
+        queue.put({**combo, "error": str(e)})
+
+
+def run_benchmark(
+    model_size: str,
+    device: str,
+    combos: List[dict],
+    clips: List[dict],
+    timeout: float = 1800
+) -> List[dict]:
+    # spawn: a clean interpreter per combination, so peak memory is not inherited
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+
+    for i, combo in enumerate(combos, 1):
+        print(f"[Benchmark] {i}/{len(combos)} {_describe(combo)}", flush=True)
+        queue = ctx.Queue()
+        process = ctx.Process(target=_combination_worker, args=(queue, model_size, device, combo, clips))
+        process.start()
+        try:
+            result = queue.get(timeout=timeout)
+        except Exception:
+            result = {**combo, "error": f"timed out after {timeout:.0f}s"}
+        process.join(timeout=10)
+        if process.is_alive():
+            process.kill()
+
+        if "error" in result:
+            print(f"[Benchmark]   failed: {result['error']}", flush=True)
+        else:
+            print(
+                f"[Benchmark]   RTF {result['rtf']:.3f} | "
+                f"peak memory {result['peak_memory_mb'] or '?'} MB | load {result['load_seconds']}s",
+                flush=True
+            )
+        results.append(result)
+
+    return results
+
+
+def pick_best(
+    results: List[dict],
+    max_memory_mb: Optional[float] = None,
+    rtf_tolerance: float = 0.1
+) -> Optional[dict]:
+    """
+    Fastest combination within the memory limit. Combinations within
+    rtf_tolerance (relative) of the fastest count as equally fast; among those
+    the larger beam size wins (better accuracy), then the lower memory.
+    """
+    candidates = [
+        r for r in results
+        if "error" not in r
+        and (max_memory_mb is None or r["peak_memory_mb"] is None or r["peak_memory_mb"] <= max_memory_mb)
+    ]
+    if not candidates:
+        return None
+
+    fastest = min(r["rtf"] for r in candidates)
+    near_fastest = [r for r in candidates if r["rtf"] <= fastest * (1 + rtf_tolerance)]
+    return min(near_fastest, key=lambda r: (-r["beam_size"], r["peak_memory_mb"] or 0, r["rtf"]))
+
+
+def write_profile(path: Path, model_size: str, device: str, best: dict, results: List[dict]):
+    profile = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count()
+        },
+        "model_size": model_size,
+        "device": device,
+        # Keys read by Settings (see app/config.py)
+        "settings": {
+            "compute_type": best["compute_type"],
+            "cpu_threads": best["cpu_threads"],
+            "num_workers": best["num_workers"],
+            "beam_size": best["beam_size"]
+        },
+        "rtf": best["rtf"],
+        "peak_memory_mb": best["peak_memory_mb"],
+        "results": results
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+
+def _describe(combo: dict) -> str:
+    return (
+        f"compute_type={combo['compute_type']} cpu_threads={combo['cpu_threads']} "
+        f"num_workers={combo['num_workers']} beam_size={combo['beam_size']}"
+    )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _str_list(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    cpu_count = os.cpu_count() or 1
+    default_threads = ",".join(str(n) for n in dict.fromkeys([max(1, cpu_count // 2), cpu_count]))
+
+    parser = argparse.ArgumentParser(description="Benchmark faster-whisper settings and write the best profile.")
+    parser.add_argument("--model", default="base", help="Whisper model size to benchmark")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-types", type=_str_list, default="int8,float32")
+    parser.add_argument("--cpu-threads", type=_int_list, default=default_threads)
+    parser.add_argument("--num-workers", type=_int_list, default="1,2")
+    parser.add_argument("--beam-sizes", type=_int_list, default="1,5")
+    parser.add_argument("--synthetic", type=_int_list, default="30,120",
+                        help="Lengths (seconds) of synthetic clips; empty to skip")
+    parser.add_argument("--clip", action="append", default=[], help="Reference audio file (repeatable)")
+    parser.add_argument("--max-memory-mb", type=float, default=None,
+                        help="Ignore combinations whose peak memory exceeds this")
+    parser.add_argument("--rtf-tolerance", type=float, default=0.1,
+                        help="Relative RTF slack within which the larger beam size is preferred")
+    parser.add_argument("--output", default=str(WHISPER_PROFILE_PATH), help="Profile file to write")
+    parser.add_argument("--dry-run", action="store_true", help="Report only, do not write the profile")
+    args = parser.parse_args(argv)
+
+    clips = [
+        {"name": f"synthetic_{seconds}s", "synthetic": True, "seconds": seconds, "seed": i}
+        for i, seconds in enumerate(args.synthetic)
+    ]
+    for clip_path in args.clip:
+        if not Path(clip_path).exists():
+            parser.error(f"Clip not found: {clip_path}")
+        clips.append({"name": Path(clip_path).name, "synthetic": False, "path": clip_path})
+    if not clips:
+        parser.error("Nothing to benchmark: give --synthetic lengths or --clip files")
+
+    combos = [
+        {"compute_type": compute_type, "cpu_threads": threads, "num_workers": workers, "beam_size": beam}
+        for compute_type in args.compute_types
+        for threads in args.cpu_threads
+        for workers in args.num_workers
+        for beam in args.beam_sizes
+    ]
+    print(f"[Benchmark] {len(combos)} combinations x {len(clips)} clips, model {args.model} on {args.device}", flush=True)
+
+    results = run_benchmark(args.model, args.device, combos, clips)
+    best = pick_best(results, args.max_memory_mb, args.rtf_tolerance)
+
+    if best is None:
+        print("[Benchmark] No combination succeeded within the limits; profile not written.", flush=True)
+        return 1
+
+    print(f"[Benchmark] Best: {_describe(best)} (RTF {best['rtf']:.3f})", flush=True)
+    if not args.dry_run:
+        write_profile(args.output, args.model, args.device, best, results)
+        print(f"[Benchmark] Profile written to {args.output} (loaded by Settings on next start)", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
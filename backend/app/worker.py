@@ -0,0 +1,139 @@
+"""
+Job Worker - VidSage
+
+Runs upload and video jobs taken from the durable job queue, so the heavy
+work happens outside the API processes (set JOB_EXECUTION_MODE=queue there).
+API and worker processes scale independently; they only share the job
+database and the upload/download directories.
+
+Usage (from the backend directory):
+    python -m app.worker
+    python -m app.worker --concurrency 4 --kinds upload
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.video_models import VideoRequest
+from app.services.job_manager import job_manager, current_owner
+from app.services.job_queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+async def run_video_job(job_id: str, payload: dict):
+    # Same path as the API: result cache, single-flight, stage limits
+    # ("claimed": an API request holds the video's run claim and waits for this job)
+    from app.services.video_pipeline import run_video_job as run_video
+
+    payload = dict(payload)
+    claimed = payload.pop("claimed", False)
+    await run_video(job_id, VideoRequest(**payload), claimed=claimed)
+
+
+async def run_upload_job(job_id: str, payload: dict):
+    # The upload pipeline (preprocess, checkpointed transcription, cleaning, indexing)
+    from app.api.routes.upload import run_queued_upload
+
+    await run_queued_upload(job_id, payload)
+
+
+HANDLERS = {
+    "upload": run_upload_job,
+    "video": run_video_job,
+}
+
+
+async def _heartbeat(job_id: str, owner: str, run: asyncio.Task) -> bool:
+    """
+    Renews the lease while the job runs; a dead worker stops renewing and the job is re-queued.
+    If the lease is lost anyway (e.g. a long stall), the job now belongs to another
+    worker, so this copy is cancelled instead of running it twice. Returns True then.
+    """
+    while True:
+        await asyncio.sleep(job_queue.lease_seconds / 3)
+        if not await run_in_threadpool(job_queue.heartbeat, job_id, owner):
+            logger.warning(f"Lost the lease on job {job_id}; cancelling it here, another worker takes over")
+            run.cancel()
+            return True
+
+
+async def _worker_slot(slot: int, owner: str, kinds: Optional[List[str]]):
+    # Leases are per slot: a job re-leased by another slot of this process must not
+    # pass this slot's heartbeat, nor be deleted by its complete()
+    owner = f"{owner}:{slot}"
+    while True:
+        # Also serves as the reaper for leases of workers that died
+        for job_id in await run_in_threadpool(job_queue.requeue_expired):
+            job_manager.fail_job(job_id, f"Gave up after {job_queue.max_attempts} attempts (worker lost each time)")
+
+        item = await run_in_threadpool(job_queue.lease, owner, kinds)
+        if item is None:
+            await asyncio.sleep(settings.WORKER_POLL_SECONDS)
+            continue
+
+        job_id = item["job_id"]
+        logger.info(f"[slot {slot}] Running {item['kind']} job {job_id} (attempt {item['attempts']})")
+        handler = HANDLERS.get(item["kind"])
+        if handler is None:
+            job_manager.fail_job(job_id, f"Unknown job kind: {item['kind']}")
+            await run_in_threadpool(job_queue.complete, job_id, owner)
+            continue
+
+        run = asyncio.create_task(handler(job_id, item["payload"]))
+        heartbeat = asyncio.create_task(_heartbeat(job_id, owner, run))
+        try:
+            await run
+        except asyncio.CancelledError:
+            if not (heartbeat.done() and not heartbeat.cancelled() and heartbeat.result()):
+                raise  # this worker is shutting down
+            # Lease lost: the new owner runs the job and records its outcome
+        except Exception as e:
+            # Handlers record their own failures; this only catches bugs in them
+            logger.error(f"[slot {slot}] Job {job_id} crashed: {e}")
+            job_manager.fail_job(job_id, str(e))
+        finally:
+            heartbeat.cancel()
+            await run_in_threadpool(job_queue.complete, job_id, owner)
+
+
+async def run_worker(concurrency: int, kinds: Optional[List[str]] = None):
+    owner = current_owner()
+    logger.info(f"Worker {owner} started: {concurrency} slots, kinds: {kinds or 'all'}")
+    # Keeps the jobs (and video run claims) this process owns from looking abandoned to other hosts
+    owner_heartbeat = asyncio.create_task(job_manager.run_owner_heartbeat())
+    try:
+        await asyncio.gather(*(
+            _worker_slot(slot, owner, kinds) for slot in range(concurrency)
+        ))
+    finally:
+        owner_heartbeat.cancel()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run VidSage jobs from the durable job queue.")
+    parser.add_argument(
+        "--concurrency", type=int,
+        default=settings.WORKER_CONCURRENCY or settings.TRANSCRIPTION_WORKERS,
+        help="Jobs run at the same time (default: WORKER_CONCURRENCY or TRANSCRIPTION_WORKERS)"
+    )
+    parser.add_argument("--kinds", default=None, help="Comma-separated job kinds to take (upload,video)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    kinds = [k.strip() for k in args.kinds.split(",")] if args.kinds else None
+
+    try:
+        asyncio.run(run_worker(args.concurrency, kinds))
+    except KeyboardInterrupt:
+        # Leased jobs are re-queued once their leases expire
+        pass
+
+
+if __name__ == "__main__":
+    main()